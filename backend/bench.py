@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+import seed
+import server
+
+# Drives the app in-process through httpx's ASGI transport, so numbers include
+# routing, validation, serialization and Mongo but not the network or uvicorn.
+# Virtual users share one event loop; compare runs made with the same options.
+SCENARIO_MIX = {"donor": 70, "orphanage_admin": 20, "super_admin": 10}
+# Mongo round trips per request, from the db entry the app puts in Server-Timing.
+# They come from the pymongo command listener, so mongomock runs have none.
+DB_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries')
+
+
+class Recorder:
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.samples = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = None
+
+    def record(self, route: str, seconds: float, ok: bool, queries: Optional[int] = None) -> None:
+        now = time.perf_counter()
+        if now < self.warmup_until:
+            return
+        if self.started is None:
+            self.started = now - seconds
+        self.samples[route].append(seconds)
+        if queries is not None:
+            self.queries[route].append(queries)
+        if not ok:
+            self.errors[route] += 1
+
+
+def percentile(ordered: list, q: float) -> float:
+    # Nearest-rank percentile over an already sorted list
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize_samples(samples: list, errors: int, elapsed: float, queries: Optional[list] = None) -> dict:
+    ordered = sorted(samples)
+    summary = {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+    if queries:
+        queries = sorted(queries)
+        summary['db_queries_mean'] = round(sum(queries) / len(queries), 2)
+        summary['db_queries_p95'] = percentile(queries, 95)
+    return summary
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {route: summarize_samples(samples, recorder.errors[route], elapsed, recorder.queries.get(route))
+              for route, samples in sorted(recorder.samples.items())}
+    every = [sample for samples in recorder.samples.values() for sample in samples]
+    queries = [count for counts in recorder.queries.values() for count in counts]
+    total = summarize_samples(every, sum(recorder.errors.values()), elapsed, queries) if every else {}
+    return {"routes": routes, "total": total}
+
+
+class Session:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.headers = {}
+        self.orphanage_id = None
+        self.count_queries = True
+
+    async def call(self, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers={**self.headers, **kwargs.pop('headers', {})},
+                                             **kwargs)
+        timing = DB_QUERIES.search(response.headers.get('server-timing', '')) if self.count_queries else None
+        self.recorder.record(route, time.perf_counter() - started, response.status_code < 400,
+                             int(timing.group(1)) if timing else None)
+        return response
+
+    async def login(self, email: str, password: str) -> None:
+        response = await self.call("POST /auth/login", "POST", "/api/auth/login",
+                                   json={"email": email, "password": password})
+        response.raise_for_status()
+        self.headers = {**self.headers, "Authorization": f"Bearer {response.json()['token']}"}
+
+
+async def donor_scenario(session: Session, fixtures: dict, writes: bool) -> None:
+    rng = session.rng
+    orphanage = rng.choice(fixtures['orphanages'])
+    params = {"view": "card", "limit": 50, "verified": "true"}
+    if rng.random() < 0.5:
+        params['city'] = orphanage['city']
+    await session.call("GET /orphanages", "GET", "/api/orphanages", params=params)
+    await session.call("GET /orphanages?search", "GET", "/api/orphanages",
+                       params={"search": orphanage['name'].split()[0], "view": "card", "limit": 20})
+    await session.call("GET /orphanages/{slug}", "GET", f"/api/orphanages/{orphanage['slug']}")
+    if writes:
+        amount = rng.choice([500, 1000, 2500, 5000])
+        response = await session.call(
+            "POST /donations/create", "POST", "/api/donations/create",
+            json={"orphanage_id": orphanage['id'], "amount": amount, "breakdown": {"MEALS": amount}},
+            headers={"Idempotency-Key": str(uuid.UUID(int=rng.getrandbits(128)))}
+        )
+        if response.status_code == 200:
+            await session.call("GET /donations/{id}/receipt", "GET", f"/api/donations/{response.json()['id']}/receipt")
+    await session.call("GET /donations/my", "GET", "/api/donations/my", params={"limit": 20})
+
+
+async def orphanage_admin_scenario(session: Session, fixtures: dict, writes: bool) -> None:
+    orphanage_id = session.orphanage_id
+    await session.call("GET /orphanages/{id}/children", "GET", f"/api/orphanages/{orphanage_id}/children",
+                       params={"limit": 50})
+    await session.call("GET /orphanages/{id}/staff", "GET", f"/api/orphanages/{orphanage_id}/staff")
+    await session.call("GET /orphanages/{id}/donations", "GET", f"/api/orphanages/{orphanage_id}/donations",
+                       params={"limit": 50})
+    await session.call("GET /analytics/orphanage/{id}", "GET", f"/api/analytics/orphanage/{orphanage_id}")
+    if writes:
+        await session.call("POST /orphanages/{id}/children", "POST", f"/api/orphanages/{orphanage_id}/children",
+                           json={"name": "Bench Child", "age": session.rng.randint(3, 17), "gender": "Female"})
+
+
+async def super_admin_scenario(session: Session, fixtures: dict, writes: bool) -> None:
+    await session.call("GET /admin/orphanages", "GET", "/api/admin/orphanages", params={"view": "card", "limit": 100})
+    await session.call("GET /admin/donations", "GET", "/api/admin/donations", params={"limit": 100})
+    await session.call("GET /analytics/platform", "GET", "/api/analytics/platform")
+    if writes:
+        orphanage = session.rng.choice(fixtures['orphanages'])
+        await session.call("PUT /admin/orphanages/{id}/verify", "PUT",
+                           f"/api/admin/orphanages/{orphanage['id']}/verify", params={"status": "VERIFIED"})
+
+
+SCENARIOS = {
+    "donor": donor_scenario,
+    "orphanage_admin": orphanage_admin_scenario,
+    "super_admin": super_admin_scenario,
+}
+
+
+async def load_fixtures(sample_size: int) -> dict:
+    db = server.db
+    orphanages = await db.orphanages.find({}, {"_id": 0, "id": 1, "slug": 1, "name": 1, "city": 1}).to_list(sample_size)
+    donors = await db.users.find({"role": "DONOR"}, {"_id": 0, "email": 1}).to_list(sample_size)
+    admins = await db.users.find({"role": "ORPHANAGE_ADMIN", "orphanage_id": {"$ne": None}},
+                                 {"_id": 0, "email": 1, "orphanage_id": 1}).to_list(sample_size)
+    super_admins = await db.users.find({"role": "SUPER_ADMIN"}, {"_id": 0, "email": 1}).to_list(sample_size)
+    if not (orphanages and donors and admins and super_admins):
+        raise SystemExit("Database has no seeded data; run seed.py first (or pass --with-seed)")
+    return {"orphanages": orphanages, "donor": donors, "orphanage_admin": admins, "super_admin": super_admins}
+
+
+async def virtual_user(kind: str, index: int, client: httpx.AsyncClient, recorder: Recorder,
+                       fixtures: dict, args, deadline: float) -> None:
+    session = Session(client, recorder, random.Random(args.random_seed * 1000 + index))
+    account = fixtures[kind][index % len(fixtures[kind])]
+    session.orphanage_id = account.get('orphanage_id')
+    session.count_queries = not args.mongomock
+    if args.admission_control:
+        session.headers['X-Forwarded-For'] = f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+    await session.login(account['email'], args.password)
+    scenario = SCENARIOS[kind]
+    while time.perf_counter() < deadline:
+        await scenario(session, fixtures, not args.read_only)
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in SCENARIOS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"expected e.g. donor=70,orphanage_admin=20,super_admin=10, got {value!r}")
+        mix[kind] = int(weight)
+    return mix
+
+
+def scenario_plan(mix: dict, concurrency: int) -> dict:
+    # Every scenario in the mix gets at least one virtual user; the remainder goes to the heaviest
+    total = sum(mix.values())
+    plan = {kind: max(1, concurrency * weight // total) for kind, weight in mix.items() if weight}
+    heaviest = max(plan, key=lambda kind: mix[kind])
+    plan[heaviest] = max(1, plan[heaviest] + concurrency - sum(plan.values()))
+    return plan
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    if args.with_seed:
+        print(f"Seeded {await seed.seed(args)}", file=sys.stderr)
+    fixtures = await load_fixtures(args.sample_size)
+    # In-process every virtual user has the same socket peer, so per-IP buckets would
+    # throttle the whole run; with admission control on, each user gets its own address
+    server.RATE_LIMIT_ENABLED = args.admission_control
+    if args.admission_control:
+        server.TRUSTED_PROXY_HOPS = 1
+
+    kinds = [kind for kind, count in scenario_plan(args.mix, args.concurrency).items() for _ in range(count)]
+    started = time.perf_counter()
+    recorder = Recorder(started + args.warmup)
+    deadline = started + args.warmup + args.duration
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(virtual_user(kind, i, client, recorder, fixtures, args, deadline)
+                               for i, kind in enumerate(kinds)))
+    elapsed = time.perf_counter() - (recorder.started or started)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "backend": "mongomock" if args.mongomock else "mongod",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "read_only": args.read_only,
+            "admission_control": args.admission_control,
+            "random_seed": args.random_seed,
+            "virtual_users": {kind: kinds.count(kind) for kind in args.mix},
+            "elapsed": round(elapsed, 3),
+        },
+        **summarize(recorder, elapsed),
+    }
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = []
+    print(f"{'route':34} {args.metric + ' base':>12} {args.metric + ' new':>12} {'change':>8}")
+    for route, base in sorted(baseline['routes'].items()):
+        new = candidate['routes'].get(route)
+        if args.metric not in base:
+            continue
+        if not new or args.metric not in new:
+            print(f"{route:34} {base[args.metric]:12.2f} {'missing':>12}")
+            continue
+        change = (new[args.metric] - base[args.metric]) / base[args.metric] if base[args.metric] else 0.0
+        # Lower is better for latency, higher is better for throughput
+        worse = -change if args.metric == "throughput_rps" else change
+        flag = ""
+        if worse > args.threshold and min(base['count'], new['count']) >= args.min_samples:
+            regressions.append(route)
+            flag = "  REGRESSION"
+        print(f"{route:34} {base[args.metric]:12.2f} {new[args.metric]:12.2f} {change:+8.1%}{flag}")
+    if regressions:
+        print(f"{len(regressions)} route(s) regressed by more than {args.threshold:.0%} on {args.metric}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OrphanCare load test and benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the scenarios and write results as JSON")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="Number of virtual users")
+    run_parser.add_argument("--mix", type=parse_mix, default=SCENARIO_MIX, help="Relative weight of each scenario")
+    run_parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="Seconds run before measuring")
+    run_parser.add_argument("--read-only", action="store_true", help="Skip donation/child/verify writes")
+    run_parser.add_argument("--admission-control", action="store_true",
+                            help="Keep rate limits and concurrency caps on (off by default)")
+    run_parser.add_argument("--random-seed", type=int, default=7)
+    run_parser.add_argument("--sample-size", type=int, default=1000, help="Accounts and orphanages to draw from")
+    run_parser.add_argument("--output", help="Write results here instead of stdout")
+    run_parser.add_argument("--mongomock", action="store_true", help="Run against in-memory mongomock")
+    run_parser.add_argument("--with-seed", action="store_true", help="Seed data in-process before running")
+    seed.add_arguments(run_parser)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files; exit 1 on regression")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--metric", default="p95_ms",
+                                choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_rps",
+                                         "db_queries_mean", "db_queries_p95"])
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change")
+    compare_parser.add_argument("--min-samples", type=int, default=20, help="Ignore routes with fewer samples")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(compare(args))
+
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.mongomock:
+        seed.use_mongomock()
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        server.client.close()
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import sys
+
+import server
+
+
+async def rebuild_rollups(args):
+    result = await server.rebuild_analytics_rollups()
+    print(f"Rebuilt {result['rollups']} rollups, {result['donor_edges']} donor edges and "
+          f"{result['orphanage_totals']} orphanage totals")
+
+
+async def ensure_indexes(args):
+    report = await server.ensure_indexes()
+    print(json.dumps(report, indent=2))
+    if any(info['failed'] for info in report.values()):
+        sys.exit(1)
+
+
+async def index_status(args):
+    print(json.dumps(await server.index_status(), indent=2, default=str))
+
+
+async def check_indexes(args):
+    results = await server.check_query_plans()
+    for result in results:
+        marker = "COLLSCAN" if result['collscan'] else "ok"
+        print(f"{marker:8} {result['route']:32} {result['collection']:18} {' <- '.join(result['stages'])}")
+    if any(result['collscan'] for result in results):
+        sys.exit(1)
+
+
+async def migrate_media(args):
+    report = await server.migrate_inline_media()
+    for collection, counts in report.items():
+        print(f"{collection:12} migrated {counts['migrated']}, failed {counts['failed']}")
+    if any(counts['failed'] for counts in report.values()):
+        sys.exit(1)
+
+
+async def geocode(args):
+    report = await server.geocode_orphanages()
+    print(f"Located {report['located']} orphanages, {report['unmatched']} unmatched")
+    for place, count in sorted(report['unmatched_places'].items(), key=lambda item: -item[1]):
+        print(f"{count:6}  {place}")
+
+
+async def refresh_funding_gaps(args):
+    result = await server.refresh_funding_gaps()
+    print(f"Wrote {result['rows']} funding gap rows, removed {result['removed']} stale rows")
+
+
+COMMANDS = {
+    "rebuild-rollups": (rebuild_rollups, "Recompute analytics rollups from raw donations"),
+    "ensure-indexes": (ensure_indexes, "Create any missing indexes"),
+    "index-status": (index_status, "Report present, missing and building indexes"),
+    "check-indexes": (check_indexes, "Explain every route query and fail on collection scans"),
+    "migrate-media": (migrate_media, "Move inline data-URL images into the media store"),
+    "geocode": (geocode, "Place orphanages without a location at their city centroid"),
+    "refresh-funding-gaps": (refresh_funding_gaps, "Recompute this month's funding gap ranking"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OrphanCare maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    args = parser.parse_args()
+
+    handler = COMMANDS[args.command][0]
+    try:
+        asyncio.run(handler(args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timezone, timedelta
+
+import server
+
+CITIES = [
+    ("Mumbai", "Maharashtra"), ("Pune", "Maharashtra"), ("Nagpur", "Maharashtra"), ("Delhi", "Delhi"),
+    ("Bengaluru", "Karnataka"), ("Mysuru", "Karnataka"), ("Chennai", "Tamil Nadu"), ("Madurai", "Tamil Nadu"),
+    ("Hyderabad", "Telangana"), ("Kolkata", "West Bengal"), ("Ahmedabad", "Gujarat"), ("Surat", "Gujarat"),
+    ("Jaipur", "Rajasthan"), ("Lucknow", "Uttar Pradesh"), ("Varanasi", "Uttar Pradesh"), ("Patna", "Bihar"),
+    ("Bhopal", "Madhya Pradesh"), ("Indore", "Madhya Pradesh"), ("Kochi", "Kerala"), ("Guwahati", "Assam"),
+]
+NAME_PREFIXES = ["Asha", "Sneha", "Karuna", "Prerna", "Umeed", "Ankur", "Sahara", "Nanhi", "Kiran", "Aasra",
+                 "Roshni", "Disha", "Anand", "Seva", "Jeevan", "Mamta", "Saathi", "Navjeevan", "Sparsh", "Udaan"]
+NAME_SUFFIXES = ["Children's Home", "Bal Ashram", "Orphanage", "Foundation", "Bal Bhavan", "Care Home", "Trust"]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ishaan", "Kabir", "Rohan", "Arjun", "Sai", "Anaya", "Diya",
+               "Saanvi", "Myra", "Aadhya", "Kiara", "Priya", "Meera", "Riya", "Neha", "Kavya", "Tara"]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Reddy", "Nair", "Iyer", "Das", "Singh", "Gupta", "Joshi",
+              "Khan", "Kumar", "Mehta", "Rao", "Pillai", "Bose", "Yadav", "Mishra", "Chopra", "Shah"]
+STAFF_ROLES = ["Caretaker", "Teacher", "Cook", "Nurse", "Counsellor", "Warden"]
+# Rough share of each category in a typical gift, used as weights for the split
+CATEGORY_WEIGHTS = {"MEALS": 40, "EDUCATION": 25, "HEALTHCARE": 15, "CLOTHES": 10, "INFRASTRUCTURE": 7, "OTHER": 3}
+SEED_DOMAIN = "seed.example.org"
+
+
+class Generator:
+    def __init__(self, seed: int, days: int):
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.days = days
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self, after: datetime = None) -> str:
+        # Skewed towards recent dates: volume grows over the period
+        start = after or self.now - timedelta(days=self.days)
+        span = (self.now - start).total_seconds()
+        return (start + timedelta(seconds=span * self.rng.random() ** 0.7)).isoformat()
+
+    def person(self) -> str:
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def phone(self) -> str:
+        return f"+91{self.rng.randint(6000000000, 9999999999)}"
+
+    def amount(self) -> float:
+        # Log-normal around ~1,000 with a long tail, rounded to 50
+        return float(max(100, round(self.rng.lognormvariate(7, 0.9) / 50) * 50))
+
+    def breakdown(self, amount: float) -> dict:
+        pool = list(CATEGORY_WEIGHTS)
+        categories = []
+        for _ in range(self.rng.choice([1, 1, 2, 2, 3])):
+            category = self.rng.choices(pool, weights=[CATEGORY_WEIGHTS[c] for c in pool])[0]
+            pool.remove(category)
+            categories.append(category)
+        weights = [CATEGORY_WEIGHTS[c] * self.rng.random() for c in categories]
+        total = sum(weights)
+        split = {c: round(amount * w / total, 2) for c, w in zip(categories, weights)}
+        split[categories[0]] = round(amount - sum(split[c] for c in categories[1:]), 2)
+        return split
+
+
+def user_doc(gen: Generator, email: str, role: str, password_hash: str, orphanage_id: str = None) -> dict:
+    city, _ = gen.rng.choice(CITIES)
+    return {
+        "id": gen.uuid(), "name": gen.person(), "email": email, "phone": gen.phone(), "country": "India",
+        "city": city, "role": role, "profile_picture": None, "orphanage_id": orphanage_id,
+        "created_at": gen.timestamp(), "password_hash": password_hash,
+    }
+
+
+def orphanage_doc(gen: Generator, index: int) -> dict:
+    city, state = gen.rng.choice(CITIES)
+    name = f"{gen.rng.choice(NAME_PREFIXES)} {gen.rng.choice(NAME_SUFFIXES)} {city} {index}"
+    verification = gen.rng.choices(["VERIFIED", "PENDING", "REJECTED"], weights=[80, 15, 5])[0]
+    meal_cost = float(gen.rng.choice([40, 50, 60, 75]))
+    # Scatter around the city centre so nearby searches have distinct distances
+    latitude, longitude = server.geocode_city(city, state)
+    latitude = round(latitude + gen.rng.uniform(-0.08, 0.08), 6)
+    longitude = round(longitude + gen.rng.uniform(-0.08, 0.08), 6)
+    return {
+        "id": gen.uuid(), "name": name, "slug": server.create_slug(name),
+        "description": f"{name} provides shelter, meals and schooling for children in {city}, {state}.",
+        "registration_number": f"REG/{state[:2].upper()}/{gen.rng.randint(10000, 99999)}",
+        "ngo_id": f"NGO{gen.rng.randint(100000, 999999)}" if gen.rng.random() < 0.7 else None,
+        "contact_person": gen.person(), "email": f"contact{index}@{SEED_DOMAIN}", "phone": gen.phone(),
+        "address": f"{gen.rng.randint(1, 500)} {gen.rng.choice(LAST_NAMES)} Nagar", "city": city, "state": state,
+        "type": gen.rng.choice(["BOYS_ONLY", "GIRLS_ONLY", "MIXED", "MIXED"]), "verification_status": verification,
+        "logo": None, "cover_image": None, "gallery": [],
+        "mission": "Every child deserves a safe home, an education and someone who cares.",
+        "bank_account": None, "per_day_meal_cost": meal_cost, "per_month_education_cost": 1500.0,
+        "per_month_healthcare_cost": 1000.0, "total_children": 0, "total_donations": 0.0,
+        "monthly_targets": {}, "created_at": gen.timestamp(),
+        **server.location_fields(latitude, longitude, city, state),
+    }
+
+
+def child_doc(gen: Generator, orphanage: dict) -> dict:
+    age = gen.rng.randint(3, 17)
+    gender = {"BOYS_ONLY": "Male", "GIRLS_ONLY": "Female"}.get(orphanage['type']) or gen.rng.choice(["Male", "Female"])
+    created_at = gen.timestamp(datetime.fromisoformat(orphanage['created_at']))
+    return {
+        "id": gen.uuid(), "orphanage_id": orphanage['id'], "name": gen.person(), "age": age, "gender": gender,
+        "class_grade": str(max(1, age - 5)) if age >= 6 else None, "bio": None,
+        "special_needs": None if gen.rng.random() > 0.05 else "Requires regular medical check-ups",
+        "photo": None, "admission_date": created_at, "created_at": created_at,
+    }
+
+
+def staff_doc(gen: Generator, orphanage: dict) -> dict:
+    return {
+        "id": gen.uuid(), "orphanage_id": orphanage['id'], "name": gen.person(),
+        "role": gen.rng.choice(STAFF_ROLES), "contact": gen.phone(), "bio": None,
+        "is_donation_contact": gen.rng.random() < 0.2, "created_at": gen.timestamp(),
+    }
+
+
+def donation_doc(gen: Generator, donor_id: str, orphanage_id: str) -> dict:
+    amount = gen.amount()
+    anonymous = gen.rng.random() < 0.1
+    return {
+        "id": gen.uuid(), "donor_id": donor_id, "orphanage_id": orphanage_id, "amount": amount,
+        "breakdown": gen.breakdown(amount), "message": None, "is_anonymous": anonymous,
+        "donor_name": None, "payment_status": "COMPLETED", "gateway_reference": f"MOCK_{gen.uuid()}",
+        "created_at": gen.timestamp(),
+    }
+
+
+async def insert_batches(collection, docs, batch_size: int) -> int:
+    count = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            count += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        count += len(batch)
+    return count
+
+
+def weighted_picker(gen: Generator, items: list, alpha: float):
+    # Pareto weights: a few popular orphanages / frequent donors, a long tail of the rest
+    weights = [gen.rng.paretovariate(alpha) for _ in items]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    def pick():
+        return items[min(bisect_left(cumulative, gen.rng.random() * total), len(items) - 1)]
+    return pick
+
+
+async def seed(args) -> dict:
+    db = server.db
+    gen = Generator(args.seed, args.days)
+    started = time.perf_counter()
+    if args.drop:
+        for name in ["users", "orphanages", "children", "staff", "donations", "analytics_rollups", "donor_edges",
+                     "funding_gaps"]:
+            await db[name].delete_many({})
+
+    # One bcrypt hash shared by every seeded account keeps seeding fast
+    password_hash = await server.hash_password(args.password)
+    counts = {}
+
+    orphanages = [orphanage_doc(gen, i) for i in range(args.orphanages)]
+    children_per = {o['id']: max(0, int(gen.rng.gauss(args.children_per_orphanage, args.children_per_orphanage / 4)))
+                    for o in orphanages}
+    for orphanage in orphanages:
+        orphanage['total_children'] = children_per[orphanage['id']]
+        orphanage['monthly_targets'] = {"MEALS": orphanage['per_day_meal_cost'] * 30 * orphanage['total_children']}
+
+    users = [user_doc(gen, f"superadmin@{SEED_DOMAIN}", "SUPER_ADMIN", password_hash)]
+    users += [user_doc(gen, f"admin{i}@{SEED_DOMAIN}", "ORPHANAGE_ADMIN", password_hash, o['id'])
+              for i, o in enumerate(orphanages)]
+    donors = [user_doc(gen, f"donor{i}@{SEED_DOMAIN}", "DONOR", password_hash) for i in range(args.donors)]
+    counts['users'] = await insert_batches(db.users, users + donors, args.batch_size)
+
+    children = (child_doc(gen, o) for o in orphanages for _ in range(children_per[o['id']]))
+    counts['children'] = await insert_batches(db.children, children, args.batch_size)
+    staff = (staff_doc(gen, o) for o in orphanages for _ in range(args.staff_per_orphanage))
+    counts['staff'] = await insert_batches(db.staff, staff, args.batch_size)
+
+    totals = {o['id']: 0.0 for o in orphanages}
+    pick_orphanage = weighted_picker(gen, [o['id'] for o in orphanages], 1.5)
+    pick_donor = weighted_picker(gen, [d['id'] for d in donors], 1.2)
+
+    def donations():
+        for _ in range(args.donations):
+            doc = donation_doc(gen, pick_donor(), pick_orphanage())
+            totals[doc['orphanage_id']] += doc['amount']
+            yield doc
+    counts['donations'] = await insert_batches(db.donations, donations(), args.batch_size) if donors else 0
+
+    for orphanage in orphanages:
+        orphanage['total_donations'] = round(totals[orphanage['id']], 2)
+    counts['orphanages'] = await insert_batches(db.orphanages, orphanages, args.batch_size)
+
+    if not args.skip_rollups:
+        await server.rebuild_analytics_rollups()
+        await server.refresh_funding_gaps()
+    if not args.skip_indexes:
+        await server.ensure_indexes()
+    counts['seconds'] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--orphanages", type=int, default=500)
+    parser.add_argument("--children-per-orphanage", type=int, default=100)
+    parser.add_argument("--staff-per-orphanage", type=int, default=5)
+    parser.add_argument("--donors", type=int, default=5000)
+    parser.add_argument("--donations", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=730, help="Spread created_at over this many days")
+    parser.add_argument("--seed", type=int, default=42, help="Same seed, same data (dates relative to today)")
+    parser.add_argument("--password", default="password", help="Password for every seeded account")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--drop", action="store_true", help="Delete existing data first")
+    parser.add_argument("--skip-rollups", action="store_true")
+    parser.add_argument("--skip-indexes", action="store_true")
+
+
+def use_mongomock() -> None:
+    import mongomock_motor
+    server.db = server.read_db = mongomock_motor.AsyncMongoMockClient()[server.db.name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic OrphanCare data")
+    add_arguments(parser)
+    parser.add_argument("--mongomock", action="store_true", help="Seed an in-memory mongomock database (dry run)")
+    args = parser.parse_args()
+    if args.mongomock:
+        use_mongomock()
+    try:
+        counts = asyncio.run(seed(args))
+    finally:
+        server.client.close()
+    print(" ".join(f"{name}={value}" for name, value in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,309 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse, ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReplaceOne, IndexModel, ASCENDING, DESCENDING, GEOSPHERE, ReturnDocument
+from pymongo.errors import PyMongoError, BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError, TypeAdapter, create_model
+from typing import List, Optional, Dict, Any, Iterable
 import uuid
 from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
 from enum import Enum
+from collections import defaultdict, OrderedDict
+import time
+import json
+import orjson
+import base64
+import binascii
+import re
+import hashlib
+import hmac
+import math
+import calendar
+import csv
+import io
+import sqlite3
+import fcntl
+import importlib.util
+import pandas as pd
+from PIL import Image, ImageOps, UnidentifiedImageError
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Instrumentation
+# Per-request counters live in a context variable; Motor copies the context into
+# its executor threads, so the command listener below attributes each Mongo
+# round trip to the request that issued it. GET /api/metrics takes a super admin's
+# token, or the static METRICS_TOKEN as a bearer for scrapers.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+class RequestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mongo_calls = 0
+        self.mongo_docs = 0
+        self.mongo_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+request_stats: contextvars.ContextVar = contextvars.ContextVar('request_stats', default=None)
+
+def format_labels(labels: List[tuple]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series: Dict[tuple, Dict[str, Any]] = {}
+    
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                labels = list(key)
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{format_labels(labels + [("le", bound)])} {count}')
+                lines.append(f'{self.name}_bucket{format_labels(labels + [("le", "+Inf")])} {series["count"]}')
+                lines.append(f'{self.name}_sum{format_labels(labels)} {series["sum"]}')
+                lines.append(f'{self.name}_count{format_labels(labels)} {series["count"]}')
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.series: Dict[tuple, float] = defaultdict(float)
+    
+    def inc(self, value: float = 1, **labels) -> None:
+        with self.lock:
+            self.series[tuple(sorted(labels.items()))] += value
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.series.items()):
+                lines.append(f"{self.name}{format_labels(list(key))} {value}")
+        return lines
+
+http_requests_total = Counter("http_requests_total", "HTTP requests by route and status")
+http_request_duration = Histogram("http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS)
+mongo_round_trips = Histogram("mongo_round_trips_per_request", "Mongo commands issued per request", COUNT_BUCKETS)
+mongo_documents = Histogram("mongo_documents_per_request", "Documents returned by Mongo per request", DOCUMENT_BUCKETS)
+mongo_command_duration = Histogram("mongo_command_duration_seconds", "Mongo command latency by command", LATENCY_BUCKETS)
+mongo_pool_wait = Histogram("mongo_pool_wait_seconds", "Time spent waiting to check out a connection", LATENCY_BUCKETS)
+mongo_pool_checkout_failures = Counter("mongo_pool_checkout_failures_total", "Failed connection checkouts by reason")
+bcrypt_duration = Histogram("bcrypt_duration_seconds", "bcrypt hash/verify time", LATENCY_BUCKETS)
+
+def reply_document_count(reply: Dict[str, Any]) -> int:
+    cursor = reply.get('cursor')
+    if cursor:
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if reply.get('value') is not None:
+        return 1
+    return 0
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        self._record(event, reply_document_count(event.reply))
+    
+    def failed(self, event):
+        self._record(event, 0)
+    
+    def _record(self, event, documents: int):
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_duration.observe(seconds, command=event.command_name)
+        stats = request_stats.get()
+        if stats is not None:
+            with stats.lock:
+                stats.mongo_calls += 1
+                stats.mongo_docs += documents
+                stats.mongo_seconds += seconds
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    # Live connection counts per server, for /metrics and the readiness check
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pools: Dict[str, Dict[str, int]] = {}
+        self.local = threading.local()
+    
+    def _adjust(self, event, **deltas) -> None:
+        address = f"{event.address[0]}:{event.address[1]}"
+        with self.lock:
+            pool = self.pools.setdefault(address, {"connections": 0, "checked_out": 0, "waiting": 0})
+            for key, delta in deltas.items():
+                pool[key] += delta
+    
+    def pool_created(self, event):
+        self._adjust(event)
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        with self.lock:
+            self.pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+    
+    def connection_created(self, event):
+        self._adjust(event, connections=1)
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        self._adjust(event, connections=-1)
+    
+    def connection_check_out_started(self, event):
+        # Checkout runs start to finish on the calling thread
+        self.local.started = time.perf_counter()
+        self._adjust(event, waiting=1)
+    
+    def connection_check_out_failed(self, event):
+        self._adjust(event, waiting=-1)
+        mongo_pool_checkout_failures.inc(reason=event.reason)
+    
+    def connection_checked_out(self, event):
+        self._adjust(event, waiting=-1, checked_out=1)
+        started = getattr(self.local, 'started', None)
+        if started is not None:
+            mongo_pool_wait.observe(time.perf_counter() - started)
+    
+    def connection_checked_in(self, event):
+        self._adjust(event, checked_out=-1)
+    
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {address: dict(pool) for address, pool in self.pools.items()}
+    
+    def render(self) -> List[str]:
+        lines = []
+        pools = self.snapshot()
+        for field in ("connections", "checked_out", "waiting"):
+            name = f"mongo_pool_{field}"
+            lines += [f"# HELP {name} Connection pool {field.replace('_', ' ')} per server", f"# TYPE {name} gauge"]
+            for address, pool in sorted(pools.items()):
+                lines.append(f"{name}{format_labels([('address', address)])} {pool[field]}")
+        return lines
+
+mongo_pool = MongoPoolListener()
+METRICS = [http_requests_total, http_request_duration, mongo_round_trips, mongo_documents,
+           mongo_command_duration, mongo_pool_wait, mongo_pool_checkout_failures, mongo_pool, bcrypt_duration]
+
+def record_bcrypt(seconds: float, operation: str) -> None:
+    bcrypt_duration.observe(seconds, operation=operation)
+    stats = request_stats.get()
+    if stats is not None:
+        with stats.lock:
+            stats.bcrypt_seconds += seconds
+
+# MongoDB connection (these settings take precedence over options in MONGO_URL)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', '10'))
+# Public listings and analytics read from secondaries lagging at most this far (90s minimum)
+MONGO_SECONDARY_READS = os.environ.get('MONGO_SECONDARY_READS', 'true').lower() == 'true'
+MONGO_READ_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_READ_MAX_STALENESS_SECONDS', '90'))
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', '2'))
+
+mongo_options = {
+    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+    "minPoolSize": MONGO_MIN_POOL_SIZE,
+    "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+    "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+}
+if MONGO_COMPRESSORS:
+    mongo_options['compressors'] = MONGO_COMPRESSORS
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener(), mongo_pool], **mongo_options)
 db = client[os.environ['DB_NAME']]
+primary_reads: contextvars.ContextVar = contextvars.ContextVar('primary_reads', default=False)
+
+class ReadRouter:
+    # read_db for public reads: the secondaries, unless the current task asked for the primary
+    def __init__(self, primary, secondary):
+        self.primary = primary
+        self.secondary = secondary
+    
+    def __getattr__(self, name: str):
+        return getattr(self.primary if primary_reads.get() else self.secondary, name)
+    
+    def __getitem__(self, name: str):
+        return (self.primary if primary_reads.get() else self.secondary)[name]
+
+# Auth, donations and admin screens read their own writes, so they stay on the primary
+read_db = ReadRouter(db, client.get_database(
+    os.environ['DB_NAME'], read_preference=SecondaryPreferred(max_staleness=MONGO_READ_MAX_STALENESS_SECONDS)
+)) if MONGO_SECONDARY_READS else db
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 72
+EVENTS_TICKET_SECONDS = int(os.environ.get('EVENTS_TICKET_SECONDS', '60'))
+
+# Password hashing (bcrypt releases the GIL, so a thread pool keeps it off the event loop)
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '4'))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', '64'))
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Authenticated-user cache (per process; TTL bounds staleness across workers)
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '10000'))
 
-app = FastAPI()
+# Public response cache
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '60'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '5000'))
+
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Enums
@@ -62,6 +335,25 @@ class PaymentStatus(str, Enum):
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
 
+class ReportKind(str, Enum):
+    DONATIONS = "DONATIONS"
+    DONOR_STATEMENTS = "DONOR_STATEMENTS"
+    ORPHANAGE_CATEGORIES = "ORPHANAGE_CATEGORIES"
+
+class ReportFormat(str, Enum):
+    CSV = "CSV"
+    PARQUET = "PARQUET"
+
+class ReportStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+class OrphanageView(str, Enum):
+    CARD = "card"
+    FULL = "full"
+
 # Models
 class UserCreate(BaseModel):
     name: str
@@ -96,10 +388,18 @@ class UserResponse(BaseModel):
     email: EmailStr
     phone: str
     country: str
-    city: Optional[str]
+    city: Optional[str] = None
     role: UserRole
-    profile_picture: Optional[str]
-    orphanage_id: Optional[str]
+    profile_picture: Optional[str] = None
+    orphanage_id: Optional[str] = None
+
+class AuthResponse(BaseModel):
+    token: str
+    user: UserResponse
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
 
 class OrphanageCreate(BaseModel):
     name: str
@@ -116,6 +416,8 @@ class OrphanageCreate(BaseModel):
     logo: Optional[str] = None
     cover_image: Optional[str] = None
     mission: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class Orphanage(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -144,8 +446,32 @@ class Orphanage(BaseModel):
     total_children: int = 0
     total_donations: float = 0.0
     monthly_targets: Dict[str, float] = {}
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location_source: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Every Orphanage field optional, for the card and fields= views of the list routes
+OrphanageListing = create_model(
+    "OrphanageListing", __config__=ConfigDict(extra="ignore"), distance_km=(Optional[float], None),
+    **{name: (Optional[field.annotation], None) for name, field in Orphanage.model_fields.items()}
+)
+
+class OrphanageReceipt(BaseModel):
+    id: str
+    name: Optional[str] = None
+    logo: Optional[str] = None
+    email: Optional[str] = None
+    address: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    registration_number: Optional[str] = None
+    ngo_id: Optional[str] = None
+
+class VerificationResult(BaseModel):
+    success: bool
+    orphanage: Orphanage
+
 class ChildCreate(BaseModel):
     name: str
     age: int
@@ -209,12 +535,266 @@ class Donation(BaseModel):
     gateway_reference: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class DonationWithOrphanage(Donation):
+    orphanage_name: str
+    orphanage_logo: Optional[str] = None
+
+class ContactSummary(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+
+class DonationReceipt(BaseModel):
+    donation: Donation
+    donor: ContactSummary
+    orphanage: Optional[OrphanageReceipt] = None
+
+class OrphanageAnalytics(BaseModel):
+    total_donations: float
+    this_month: float
+    this_year: float
+    category_totals: Dict[str, float]
+    total_donors: int
+    recent_donations: List[Donation]
+
+class PlatformAnalytics(BaseModel):
+    total_orphanages: int
+    verified_orphanages: int
+    pending_orphanages: int
+    total_donations: float
+    total_donors: int
+    total_transactions: int
+
+class SuccessResponse(BaseModel):
+    success: bool
+
+class BulkImportError(BaseModel):
+    row: int
+    errors: Any
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
+class PoolStatus(BaseModel):
+    connections: int
+    checked_out: int
+    waiting: int
+    saturation: float
+
+class ReadinessReport(BaseModel):
+    ready: bool
+    mongo: bool
+    mongo_latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    pools: Dict[str, PoolStatus]
+    password_hashing_pending: int
+
+class MediaVariant(BaseModel):
+    url: str
+    content_type: str
+    width: int
+    height: int
+
+class MediaInfo(BaseModel):
+    id: str
+    url: str
+    content_type: str
+    size: int
+    width: int
+    height: int
+    variants: Dict[str, MediaVariant]
+    uploaded_by: Optional[str] = None
+    created_at: datetime
+
+class FundingGap(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    orphanage_id: str
+    name: str
+    slug: str
+    city: str
+    state: str
+    category: str
+    month: str
+    need: float
+    raised: float
+    remaining: float
+    funded_percent: float
+    refreshed_at: datetime
+
+class ReportRequest(BaseModel):
+    kind: ReportKind
+    format: ReportFormat = ReportFormat.CSV
+    year: Optional[int] = Field(None, ge=2000, le=2100)
+
+class ReportJob(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: ReportKind
+    format: ReportFormat
+    year: Optional[int] = None
+    status: ReportStatus = ReportStatus.PENDING
+    rows: int = 0
+    error: Optional[str] = None
+    requested_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    completed_at: Optional[datetime] = None
+
 # Helper Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        self._entries.clear()
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+user_cache = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+class BoundedExecutor:
+    # Thread pool with a cap on queued + running jobs; beyond it callers get a 429
+    def __init__(self, max_workers: int, max_pending: int, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.max_pending = max_pending
+        self.pending = 0
+    
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(status_code=429, detail="Server busy, please retry shortly",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            # Run inside a copy of the caller's context so per-request stats reach the worker
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, fn, *args)
+        finally:
+            self.pending -= 1
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_executor = BoundedExecutor(BCRYPT_WORKERS, BCRYPT_MAX_PENDING, "bcrypt")
+
+class ResponseCache:
+    # Works with any backend exposing get/set (TTLCache in-process, or a shared
+    # store). Keys embed a random version token per namespace, so invalidating a
+    # namespace is a single set and old entries simply become unreachable.
+    def __init__(self, backend):
+        self.backend = backend
+        self.invalidated_at: Dict[str, float] = {}
+    
+    def version(self, namespace: str) -> str:
+        token = self.backend.get(f"version:{namespace}")
+        if token is None:
+            token = uuid.uuid4().hex
+            self.backend.set(f"version:{namespace}", token)
+        return token
+    
+    def invalidate(self, *namespaces: str) -> None:
+        now = time.monotonic()
+        for namespace in namespaces:
+            self.backend.set(f"version:{namespace}", uuid.uuid4().hex)
+            self.invalidated_at[namespace] = now
+    
+    def invalidated_within(self, namespaces: List[str], seconds: float) -> bool:
+        cutoff = time.monotonic() - seconds
+        return any(self.invalidated_at.get(namespace, cutoff) > cutoff for namespace in namespaces)
+    
+    def key(self, request: Request, namespaces: List[str]) -> str:
+        versions = ",".join(f"{namespace}@{self.version(namespace)}" for namespace in namespaces)
+        params = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+        return f"{versions}|{request.url.path}?{params}"
+
+response_cache = ResponseCache(TTLCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS))
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+response_adapters: Dict[Any, TypeAdapter] = {}
+
+async def cached_response(request: Request, namespaces: List[str], load, model,
+                          exclude_unset: bool = False) -> Response:
+    # The body is validated and serialized through the route's response model, as
+    # FastAPI would, so a raw Response never leaks fields the model does not declare
+    adapter = response_adapters.get(model)
+    if adapter is None:
+        adapter = response_adapters[model] = TypeAdapter(model)
+    key = response_cache.key(request, namespaces)
+    entry = response_cache.backend.get(key)
+    if entry is None:
+        # load() gets a scratch response so pagination headers are cached with the body.
+        # Soon after this worker invalidated the data a secondary may not have the write
+        # yet, and whatever the fill reads is cached, so it reads from the primary.
+        scratch = Response()
+        token = primary_reads.set(response_cache.invalidated_within(namespaces, MONGO_READ_MAX_STALENESS_SECONDS))
+        try:
+            body = adapter.dump_json(adapter.validate_python(await load(scratch)), exclude_unset=exclude_unset)
+        finally:
+            primary_reads.reset(token)
+        entry = {
+            "body": body,
+            "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+            "headers": {k: v for k, v in scratch.headers.items() if k.startswith('x-')}
+        }
+        response_cache.backend.set(key, entry)
+    
+    headers = {**entry['headers'], "ETag": entry['etag'], "Cache-Control": "no-cache"}
+    if etag_matches(request, entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry['body'], media_type="application/json", headers=headers)
+
+
+def _hash_password_sync(password: str) -> str:
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+    record_bcrypt(time.perf_counter() - started, "hash")
+    return hashed
+
+def _verify_password_sync(password: str, hashed: str) -> bool:
+    started = time.perf_counter()
+    valid = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    record_bcrypt(time.perf_counter() - started, "verify")
+    return valid
+
+async def hash_password(password: str) -> str:
+    return await password_executor.run(_hash_password_sync, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await password_executor.run(_verify_password_sync, password, hashed)
+
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 def create_token(user_id: str, role: str) -> str:
     payload = {
@@ -224,6 +804,16 @@ def create_token(user_id: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def create_stream_ticket(user_id: str, role: str) -> str:
+    # Goes in a URL (and so into access logs): short-lived and only good for opening a stream
+    payload = {
+        'user_id': user_id,
+        'role': role,
+        'purpose': 'events',
+        'exp': datetime.now(timezone.utc) + timedelta(seconds=EVENTS_TICKET_SECONDS)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
 def verify_token(token: str) -> Dict[str, Any]:
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
@@ -234,26 +824,1950 @@ def verify_token(token: str) -> Dict[str, Any]:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
-    token = credentials.credentials
+    return await user_from_token(credentials.credentials)
+
+async def get_stream_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+                          ticket: Optional[str] = Query(None)) -> Dict[str, Any]:
+    # EventSource cannot set headers, so streams also accept a ?ticket= from POST /api/events/ticket
+    if credentials:
+        return await user_from_token(credentials.credentials)
+    if ticket:
+        return await user_from_token(ticket, purpose="events")
+    raise HTTPException(status_code=403, detail="Not authenticated")
+
+async def user_from_token(token: str, purpose: Optional[str] = None) -> Dict[str, Any]:
     payload = verify_token(token)
-    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    if payload.get('purpose') != purpose:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = user_cache.get(payload['user_id'])
+    if user is None:
+        user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0, "password_hash": 0})
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.set(payload['user_id'], user)
+    # Handlers mutate the returned dict, so never hand out the cached instance
+    return dict(user)
 
 def create_slug(name: str) -> str:
     return name.lower().replace(" ", "-").replace("'", "").replace('"', "")
 
+# Enrichment Helpers
+ORPHANAGE_SUMMARY_FIELDS = {"name": 1, "logo": 1, "email": 1}
+ORPHANAGE_RECEIPT_FIELDS = {**ORPHANAGE_SUMMARY_FIELDS, "address": 1, "city": 1, "state": 1,
+                            "registration_number": 1, "ngo_id": 1}
+DONOR_SUMMARY_FIELDS = {"name": 1, "email": 1}
+
+async def find_by_ids(collection, ids, fields: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    # One $in query for all distinct ids instead of a find_one per row
+    unique_ids = list({i for i in ids if i})
+    if not unique_ids:
+        return {}
+    projection = {"_id": 0, "id": 1, **fields}
+    docs = await collection.find({"id": {"$in": unique_ids}}, projection).to_list(len(unique_ids))
+    return {doc['id']: doc for doc in docs}
+
+async def attach_orphanage_summaries(donations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    orphanages = await find_by_ids(db.orphanages, (d['orphanage_id'] for d in donations), ORPHANAGE_SUMMARY_FIELDS)
+    for donation in donations:
+        orphanage = orphanages.get(donation['orphanage_id'])
+        donation['orphanage_name'] = orphanage.get('name', 'Unknown') if orphanage else 'Unknown'
+        donation['orphanage_logo'] = orphanage.get('logo') if orphanage else None
+    return donations
+
+async def attach_donor_names(donations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    donor_ids = (d['donor_id'] for d in donations if not d.get('is_anonymous'))
+    donors = await find_by_ids(db.users, donor_ids, DONOR_SUMMARY_FIELDS)
+    for donation in donations:
+        donor = None if donation.get('is_anonymous') else donors.get(donation['donor_id'])
+        donation['donor_name'] = donor.get('name', 'Anonymous') if donor else 'Anonymous'
+    return donations
+
+# Analytics Helpers
+def period_starts(now: datetime) -> Dict[str, str]:
+    # created_at is stored as a UTC ISO string, so period boundaries compare lexicographically
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return {"month": month_start.isoformat(), "year": month_start.replace(month=1).isoformat()}
+
+async def aggregate_donation_stats(match: Dict[str, Any]) -> Dict[str, Any]:
+    starts = period_starts(datetime.now(timezone.utc))
+    pipeline = [
+        {"$match": match},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}}],
+            "this_month": [
+                {"$match": {"created_at": {"$gte": starts['month']}}},
+                {"$group": {"_id": None, "amount": {"$sum": "$amount"}}}
+            ],
+            "this_year": [
+                {"$match": {"created_at": {"$gte": starts['year']}}},
+                {"$group": {"_id": None, "amount": {"$sum": "$amount"}}}
+            ],
+            "categories": [
+                {"$project": {"breakdown": {"$objectToArray": {"$ifNull": ["$breakdown", {}]}}}},
+                {"$unwind": "$breakdown"},
+                {"$group": {"_id": "$breakdown.k", "amount": {"$sum": "$breakdown.v"}}}
+            ],
+            "donors": [{"$group": {"_id": "$donor_id"}}, {"$count": "count"}]
+        }}
+    ]
+    result = (await read_db.donations.aggregate(pipeline).to_list(1))[0]
+    
+    def first(facet: str, field: str):
+        return result[facet][0][field] if result[facet] else 0
+    
+    # Same folding as the rollups, so category_totals keeps its shape once they are built
+    category_totals = defaultdict(int)
+    for row in result['categories']:
+        category_totals[rollup_category(row['_id'])] += row['amount']
+    category_totals = dict(category_totals)
+    
+    return {
+        "total_amount": first('totals', 'amount'),
+        "total_transactions": first('totals', 'count'),
+        "this_month": first('this_month', 'amount'),
+        "this_year": first('this_year', 'amount'),
+        "category_totals": category_totals,
+        "total_donors": first('donors', 'count')
+    }
+
+# Analytics Rollups
+# One pre-aggregated document per orphanage ("orphanage:<id>") plus one for the
+# platform, kept current with $inc on every donation. donor_edges holds one row per
+# (donor, rollup) pair so distinct donor counts only move when a new edge is upserted.
+# Donations made before rollups existed are only counted once a rebuild has run; it
+# leaves a "built" marker, and until then analytics fall back to aggregating.
+PLATFORM_ROLLUP_ID = "platform"
+ROLLUPS_BUILT_ID = "built"
+ROLLUP_WRITE_CHUNK = 1000
+ROLLUP_BACKFILL_ON_STARTUP = os.environ.get('ROLLUP_BACKFILL_ON_STARTUP', 'true').lower() == 'true'
+rollups_ready = False
+
+def orphanage_rollup_id(orphanage_id: str) -> str:
+    return f"orphanage:{orphanage_id}"
+
+def rollup_category(category: str) -> str:
+    return category if category in DonationCategory.__members__ else DonationCategory.OTHER.value
+
+def rollup_increments(donation: Dict[str, Any]) -> Dict[str, float]:
+    created_at = donation['created_at']
+    day, month, year = created_at[:10], created_at[:7], created_at[:4]
+    amount = donation['amount']
+    increments = defaultdict(int, {
+        "total_amount": amount,
+        "total_transactions": 1,
+        f"daily.{day}": amount,
+        f"monthly.{month}": amount,
+        f"yearly.{year}": amount
+    })
+    for category, value in donation.get('breakdown', {}).items():
+        category = rollup_category(category)
+        increments[f"categories.{category}"] += value
+        increments[f"monthly_categories.{month}.{category}"] += value
+    return increments
+
+async def apply_donation_rollups(donations: List[Dict[str, Any]]) -> None:
+    increments = defaultdict(lambda: defaultdict(int))
+    edges = set()
+    for donation in donations:
+        for rollup_id in (orphanage_rollup_id(donation['orphanage_id']), PLATFORM_ROLLUP_ID):
+            for field, value in rollup_increments(donation).items():
+                increments[rollup_id][field] += value
+            edges.add((donation['donor_id'], rollup_id))
+    
+    edges = sorted(edges)
+    edge_result = await db.donor_edges.bulk_write([
+        UpdateOne({"donor_id": donor_id, "rollup_id": rollup_id},
+                  {"$setOnInsert": {"donor_id": donor_id, "rollup_id": rollup_id}}, upsert=True)
+        for donor_id, rollup_id in edges
+    ], ordered=False)
+    for index in edge_result.upserted_ids:
+        increments[edges[index][1]]["total_donors"] += 1
+    
+    now = datetime.now(timezone.utc).isoformat()
+    await db.analytics_rollups.bulk_write([
+        UpdateOne({"id": rollup_id}, {"$inc": dict(fields), "$set": {"updated_at": now}}, upsert=True)
+        for rollup_id, fields in increments.items()
+    ], ordered=False)
+
+def rollup_summary(rollup: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    month, year = now.strftime('%Y-%m'), now.strftime('%Y')
+    return {
+        "total_amount": rollup.get('total_amount', 0),
+        "total_transactions": rollup.get('total_transactions', 0),
+        "this_month": rollup.get('monthly', {}).get(month, 0),
+        "this_year": rollup.get('yearly', {}).get(year, 0),
+        "category_totals": rollup.get('categories', {}),
+        "total_donors": rollup.get('total_donors', 0)
+    }
+
+async def rollups_built() -> bool:
+    # Once built, rollups stay complete, so only the negative answer is re-checked
+    global rollups_ready
+    if not rollups_ready:
+        rollups_ready = await db.analytics_rollups.find_one({"id": ROLLUPS_BUILT_ID}, {"_id": 1}) is not None
+    return rollups_ready
+
+async def rollup_stats(rollup_id: str) -> Optional[Dict[str, Any]]:
+    if not await rollups_built():
+        return None
+    now = datetime.now(timezone.utc)
+    month, year = now.strftime('%Y-%m'), now.strftime('%Y')
+    rollup = await read_db.analytics_rollups.find_one({"id": rollup_id}, {
+        "_id": 0, "total_amount": 1, "total_transactions": 1, "total_donors": 1,
+        "categories": 1, f"monthly.{month}": 1, f"yearly.{year}": 1
+    })
+    return rollup_summary(rollup) if rollup else None
+
+async def rebuild_analytics_rollups(repair_totals: bool = True) -> Dict[str, int]:
+    # Repair path: recompute every rollup, donor edge and (with repair_totals)
+    # orphanage total_donations from the raw donations. Donations written while
+    # this runs may be counted twice or not at all, so the automatic startup
+    # backfill leaves the money totals alone.
+    rollups = defaultdict(lambda: defaultdict(int))
+    totals = defaultdict(float)
+    
+    def add(orphanage_id: str, field: str, value: float):
+        rollups[orphanage_rollup_id(orphanage_id)][field] += value
+        rollups[PLATFORM_ROLLUP_ID][field] += value
+    
+    daily = db.donations.aggregate([
+        {"$group": {
+            "_id": {"orphanage_id": "$orphanage_id", "day": {"$substr": ["$created_at", 0, 10]}},
+            "amount": {"$sum": "$amount"},
+            "count": {"$sum": 1}
+        }}
+    ])
+    async for row in daily:
+        orphanage_id, day = row['_id']['orphanage_id'], row['_id']['day']
+        totals[orphanage_id] += row['amount']
+        add(orphanage_id, "total_amount", row['amount'])
+        add(orphanage_id, "total_transactions", row['count'])
+        add(orphanage_id, f"daily.{day}", row['amount'])
+        add(orphanage_id, f"monthly.{day[:7]}", row['amount'])
+        add(orphanage_id, f"yearly.{day[:4]}", row['amount'])
+    
+    categories = db.donations.aggregate([
+        {"$project": {
+            "orphanage_id": 1,
+            "month": {"$substr": ["$created_at", 0, 7]},
+            "breakdown": {"$objectToArray": {"$ifNull": ["$breakdown", {}]}}
+        }},
+        {"$unwind": "$breakdown"},
+        {"$group": {
+            "_id": {"orphanage_id": "$orphanage_id", "month": "$month", "category": "$breakdown.k"},
+            "amount": {"$sum": "$breakdown.v"}
+        }}
+    ])
+    async for row in categories:
+        orphanage_id, month = row['_id']['orphanage_id'], row['_id']['month']
+        category = rollup_category(row['_id']['category'])
+        add(orphanage_id, f"categories.{category}", row['amount'])
+        add(orphanage_id, f"monthly_categories.{month}.{category}", row['amount'])
+    
+    await db.donor_edges.delete_many({})
+    edge_count = 0
+    batch = []
+    donor_pairs = db.donations.aggregate([
+        {"$group": {"_id": {"donor_id": "$donor_id", "orphanage_id": "$orphanage_id"}}}
+    ])
+    platform_donors = set()
+    async for row in donor_pairs:
+        donor_id, rollup_id = row['_id']['donor_id'], orphanage_rollup_id(row['_id']['orphanage_id'])
+        batch.append({"donor_id": donor_id, "rollup_id": rollup_id})
+        rollups[rollup_id]["total_donors"] += 1
+        if donor_id not in platform_donors:
+            platform_donors.add(donor_id)
+            batch.append({"donor_id": donor_id, "rollup_id": PLATFORM_ROLLUP_ID})
+        if len(batch) >= ROLLUP_WRITE_CHUNK:
+            await db.donor_edges.insert_many(batch)
+            edge_count += len(batch)
+            batch = []
+    if batch:
+        await db.donor_edges.insert_many(batch)
+        edge_count += len(batch)
+    rollups[PLATFORM_ROLLUP_ID]["total_donors"] = len(platform_donors)
+    
+    now = datetime.now(timezone.utc).isoformat()
+    ops = []
+    for rollup_id, fields in rollups.items():
+        doc = {"id": rollup_id, "updated_at": now}
+        for path, value in fields.items():
+            *parents, leaf = path.split('.')
+            target = doc
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = value
+        ops.append(ReplaceOne({"id": rollup_id}, doc, upsert=True))
+    for start in range(0, len(ops), ROLLUP_WRITE_CHUNK):
+        await db.analytics_rollups.bulk_write(ops[start:start + ROLLUP_WRITE_CHUNK], ordered=False)
+    await db.analytics_rollups.delete_many({"id": {"$nin": list(rollups) + [ROLLUPS_BUILT_ID]}})
+    await db.analytics_rollups.replace_one({"id": ROLLUPS_BUILT_ID}, {"id": ROLLUPS_BUILT_ID, "built_at": now},
+                                           upsert=True)
+    
+    if not repair_totals:
+        return {"rollups": len(rollups), "donor_edges": edge_count, "orphanage_totals": 0}
+    total_ops = [UpdateOne({"id": orphanage_id}, {"$set": {"total_donations": amount}})
+                 for orphanage_id, amount in totals.items()]
+    for start in range(0, len(total_ops), ROLLUP_WRITE_CHUNK):
+        await db.orphanages.bulk_write(total_ops[start:start + ROLLUP_WRITE_CHUNK], ordered=False)
+    await db.orphanages.update_many({"id": {"$nin": list(totals)}, "total_donations": {"$ne": 0}},
+                                    {"$set": {"total_donations": 0}})
+    
+    return {"rollups": len(rollups), "donor_edges": edge_count, "orphanage_totals": len(totals)}
+
+# Leases
+# Background jobs that every worker starts but only one should run (the periodic
+# funding gap refresh) take a named lease in Mongo. The holder renews it each time
+# round; once it stops renewing, the lease expires and another worker takes over.
+WORKER_ID = uuid.uuid4().hex
+
+async def acquire_lease(name: str, seconds: float) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.find_one_and_update(
+            {"id": name, "$or": [{"holder": WORKER_ID}, {"expires_at": {"$lt": now.isoformat()}}]},
+            {"$set": {"holder": WORKER_ID, "expires_at": (now + timedelta(seconds=seconds)).isoformat()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Held by a live worker: the filter missed and the upsert collided with its lease
+        return False
+    return True
+
+# Funding Gaps
+# funding_gaps holds one row per (verified orphanage, category) for the current
+# month, plus a TOTAL row, ranked by the amount still needed. The need comes from
+# monthly_targets where set, else from the per-child costs; raised comes from the
+# monthly rollups, or from donations until those are built. A periodic refresh
+# (run by whichever worker holds the lease) rebuilds the rows and every donation
+# $incs its own rows in between.
+FUNDING_GAP_REFRESH_SECONDS = float(os.environ.get('FUNDING_GAP_REFRESH_SECONDS', '900'))
+FUNDING_GAP_TOTAL = "TOTAL"
+FUNDING_GAP_SORT = [("remaining", DESCENDING), ("id", ASCENDING)]
+
+def funding_gap_id(orphanage_id: str, category: str) -> str:
+    return f"{orphanage_id}:{category}"
+
+def funding_needs(orphanage: Dict[str, Any], days_in_month: int) -> Dict[str, float]:
+    children = orphanage.get('total_children') or 0
+    needs = {
+        DonationCategory.MEALS.value: (orphanage.get('per_day_meal_cost') or 0) * children * days_in_month,
+        DonationCategory.EDUCATION.value: (orphanage.get('per_month_education_cost') or 0) * children,
+        DonationCategory.HEALTHCARE.value: (orphanage.get('per_month_healthcare_cost') or 0) * children,
+    }
+    for category, target in (orphanage.get('monthly_targets') or {}).items():
+        needs[rollup_category(category)] = target
+    return {category: need for category, need in needs.items() if need and need > 0}
+
+def funding_gap_rows(orphanage: Dict[str, Any], rollup: Dict[str, Any], month: str,
+                     days_in_month: int, refreshed_at: str) -> List[Dict[str, Any]]:
+    needs = funding_needs(orphanage, days_in_month)
+    if not needs:
+        return []
+    raised = rollup.get('monthly_categories', {}).get(month, {})
+    raised_total = rollup.get('monthly', {}).get(month, 0)
+    base = {key: orphanage.get(key) for key in ("name", "slug", "city", "state")}
+    rows = [(category, need, raised.get(category, 0)) for category, need in needs.items()]
+    rows.append((FUNDING_GAP_TOTAL, sum(needs.values()), raised_total))
+    return [
+        {"id": funding_gap_id(orphanage['id'], category), "orphanage_id": orphanage['id'], **base,
+         "category": category, "month": month, "need": need, "raised": amount,
+         "remaining": need - amount, "refreshed_at": refreshed_at}
+        for category, need, amount in rows
+    ]
+
+async def monthly_raised_from_donations(orphanage_ids: List[str], month: str) -> Dict[str, Dict[str, Any]]:
+    # Until the rollups are built, read the month straight off donations, shaped like the rollup docs
+    year, number = int(month[:4]), int(month[5:])
+    next_month = f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+    match = {"$match": {"orphanage_id": {"$in": orphanage_ids}, "created_at": {"$gte": month, "$lt": next_month}}}
+    raised = defaultdict(lambda: {"monthly": {month: 0}, "monthly_categories": {month: defaultdict(int)}})
+    totals = db.donations.aggregate([match, {"$group": {"_id": "$orphanage_id", "amount": {"$sum": "$amount"}}}])
+    async for row in totals:
+        raised[orphanage_rollup_id(row['_id'])]['monthly'][month] = row['amount']
+    categories = db.donations.aggregate([
+        match,
+        {"$project": {"orphanage_id": 1, "breakdown": {"$objectToArray": {"$ifNull": ["$breakdown", {}]}}}},
+        {"$unwind": "$breakdown"},
+        {"$group": {"_id": {"orphanage_id": "$orphanage_id", "category": "$breakdown.k"},
+                    "amount": {"$sum": "$breakdown.v"}}}
+    ])
+    async for row in categories:
+        rollup = raised[orphanage_rollup_id(row['_id']['orphanage_id'])]
+        rollup['monthly_categories'][month][rollup_category(row['_id']['category'])] += row['amount']
+    return dict(raised)
+
+async def refresh_funding_gaps(orphanage_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    # A donation landing between the raised read and the replace is missed until the next refresh
+    now = datetime.now(timezone.utc)
+    month, days_in_month = now.strftime('%Y-%m'), calendar.monthrange(now.year, now.month)[1]
+    refreshed_at = now.isoformat()
+    query = {"verification_status": VerificationStatus.VERIFIED}
+    if orphanage_ids is not None:
+        query['id'] = {"$in": orphanage_ids}
+    projection = {"_id": 0, "id": 1, "name": 1, "slug": 1, "city": 1, "state": 1, "total_children": 1,
+                  "per_day_meal_cost": 1, "per_month_education_cost": 1, "per_month_healthcare_cost": 1,
+                  "monthly_targets": 1}
+    
+    rows_written = 0
+    use_rollups = await rollups_built()
+    
+    async def write(orphanages: List[Dict[str, Any]]) -> int:
+        if use_rollups:
+            rollups = await find_by_ids(db.analytics_rollups, [orphanage_rollup_id(o['id']) for o in orphanages],
+                                        {f"monthly.{month}": 1, f"monthly_categories.{month}": 1})
+        else:
+            rollups = await monthly_raised_from_donations([o['id'] for o in orphanages], month)
+        ops = [
+            ReplaceOne({"id": row['id']}, row, upsert=True)
+            for orphanage in orphanages
+            for row in funding_gap_rows(orphanage, rollups.get(orphanage_rollup_id(orphanage['id']), {}),
+                                        month, days_in_month, refreshed_at)
+        ]
+        if ops:
+            await db.funding_gaps.bulk_write(ops, ordered=False)
+        return len(ops)
+    
+    batch = []
+    async for orphanage in db.orphanages.find(query, projection):
+        batch.append(orphanage)
+        if len(batch) >= ROLLUP_WRITE_CHUNK:
+            rows_written += await write(batch)
+            batch = []
+    if batch:
+        rows_written += await write(batch)
+    
+    # Rows not rewritten belong to orphanages that lost verification, were deleted or have no needs.
+    # Only older rows go: a refresh that started after this one may already have written its own.
+    stale = {"refreshed_at": {"$lt": refreshed_at}}
+    if orphanage_ids is not None:
+        stale['orphanage_id'] = {"$in": orphanage_ids}
+    removed = await db.funding_gaps.delete_many(stale)
+    response_cache.invalidate("funding_gaps")
+    return {"rows": rows_written, "removed": removed.deleted_count}
+
+async def apply_donation_funding_gaps(donations: List[Dict[str, Any]]) -> None:
+    increments = defaultdict(lambda: defaultdict(float))
+    for donation in donations:
+        month = donation['created_at'][:7]
+        increments[(donation['orphanage_id'], FUNDING_GAP_TOTAL, month)]['raised'] += donation['amount']
+        for category, value in donation.get('breakdown', {}).items():
+            increments[(donation['orphanage_id'], rollup_category(category), month)]['raised'] += value
+    if not increments:
+        return
+    # Rows for another month (or none at all) are left for the next refresh
+    await db.funding_gaps.bulk_write([
+        UpdateOne({"id": funding_gap_id(orphanage_id, category), "month": month},
+                  {"$inc": {"raised": fields['raised'], "remaining": -fields['raised']}})
+        for (orphanage_id, category, month), fields in increments.items()
+    ], ordered=False)
+    response_cache.invalidate("funding_gaps")
+
+def funding_gap_view(gap: Dict[str, Any]) -> Dict[str, Any]:
+    return {**gap, "remaining": max(gap['remaining'], 0),
+            "funded_percent": round(min(gap['raised'] / gap['need'], 1) * 100, 1) if gap['need'] else 100.0}
+
+async def run_funding_gap_refresh() -> None:
+    while True:
+        try:
+            if await acquire_lease("funding_gap_refresh", FUNDING_GAP_REFRESH_SECONDS * 1.5):
+                result = await refresh_funding_gaps()
+                logger.info(f"Refreshed funding gaps: {result['rows']} rows, {result['removed']} removed")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Funding gap refresh failed")
+        await asyncio.sleep(FUNDING_GAP_REFRESH_SECONDS)
+
+# Live Events
+# Dashboards subscribe to GET /api/events/stream (server-sent events). One change
+# stream per process tails donation inserts and rollup updates and fans each one
+# out to the matching subscribers: an orphanage admin gets their orphanage's
+# events, a super admin everything (or one orphanage). Without change streams
+# (standalone mongod, or LIVE_EVENTS_SOURCE=local) the donation write paths
+# publish in-process instead, which only reaches subscribers on the same worker.
+LIVE_EVENTS_SOURCE = os.environ.get('LIVE_EVENTS_SOURCE', 'change_stream')
+LIVE_EVENTS_QUEUE_SIZE = int(os.environ.get('LIVE_EVENTS_QUEUE_SIZE', '100'))
+LIVE_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_EVENTS_HEARTBEAT_SECONDS', '15'))
+LIVE_ROLLUP_FIELDS = {"_id": 0, "id": 1, "total_amount": 1, "total_transactions": 1, "total_donors": 1,
+                      "categories": 1, "monthly": 1, "yearly": 1}
+# updateLookup fetches the rollup after each $inc; only the summary fields travel back
+LIVE_EVENTS_PIPELINE = [
+    {"$match": {"$or": [
+        {"ns.coll": "donations", "operationType": "insert"},
+        {"ns.coll": "analytics_rollups", "operationType": {"$in": ["insert", "update"]}},
+    ]}},
+    {"$project": {"ns": 1, "fullDocument": {"$cond": [
+        {"$eq": ["$ns.coll", "donations"]}, "$fullDocument",
+        {key: f"$fullDocument.{key}" for key, value in LIVE_ROLLUP_FIELDS.items() if value}
+    ]}}},
+]
+CHANGE_STREAMS_UNSUPPORTED = 40573
+LAGGED = {"event": "lagged", "data": {}}
+
+live_events_published = Counter("live_events_published_total", "Live events queued for subscribers by type")
+live_events_dropped = Counter("live_events_dropped_total", "Subscribers cut off for falling behind")
+
+class LiveEventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: Dict[asyncio.Queue, Optional[str]] = {}
+        # Switched off while a change stream is feeding the hub
+        self.publish_locally = True
+    
+    def subscribe(self, orphanage_id: Optional[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers[queue] = orphanage_id
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.pop(queue, None)
+    
+    def publish(self, event: str, data: Dict[str, Any], orphanage_id: Optional[str]) -> None:
+        # orphanage_id=None marks platform-wide events, seen only by unscoped subscribers
+        for queue, scope in list(self.subscribers.items()):
+            if scope is not None and scope != orphanage_id:
+                continue
+            try:
+                queue.put_nowait({"event": event, "data": data})
+                live_events_published.inc(event=event)
+            except asyncio.QueueFull:
+                # A stalled client is cut off rather than buffered; EventSource reconnects for a fresh snapshot
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(LAGGED)
+                live_events_dropped.inc()
+    
+    def render(self) -> List[str]:
+        return ["# HELP live_event_subscribers Open live event streams",
+                "# TYPE live_event_subscribers gauge",
+                f"live_event_subscribers {len(self.subscribers)}"]
+
+live_events = LiveEventHub(LIVE_EVENTS_QUEUE_SIZE)
+METRICS += [live_events_published, live_events_dropped, live_events]
+
+def rollup_event(rollup: Dict[str, Any]) -> Dict[str, Any]:
+    rollup_id = rollup['id']
+    orphanage_id = rollup_id.split(':', 1)[1] if rollup_id != PLATFORM_ROLLUP_ID else None
+    return {"orphanage_id": orphanage_id, **rollup_summary(rollup)}
+
+def publish_rollup(rollup: Dict[str, Any]) -> None:
+    event = rollup_event(rollup)
+    live_events.publish("totals", event, event['orphanage_id'])
+
+def publish_donation(doc: Dict[str, Any]) -> None:
+    live_events.publish("donation", jsonable_encoder(Donation(**doc)), doc['orphanage_id'])
+
+async def publish_donation_events(donations: List[Dict[str, Any]]) -> None:
+    if not live_events.publish_locally or not live_events.subscribers:
+        return
+    for doc in donations:
+        publish_donation(doc)
+    rollup_ids = [orphanage_rollup_id(orphanage_id) for orphanage_id in {d['orphanage_id'] for d in donations}]
+    async for rollup in db.analytics_rollups.find({"id": {"$in": rollup_ids + [PLATFORM_ROLLUP_ID]}},
+                                                  LIVE_ROLLUP_FIELDS):
+        publish_rollup(rollup)
+
+def dispatch_change(change: Dict[str, Any]) -> None:
+    doc = change.get('fullDocument')
+    if not doc:
+        return
+    if change['ns']['coll'] == "donations":
+        publish_donation(doc)
+    elif doc.get('id'):
+        publish_rollup(doc)
+
+async def run_live_events() -> None:
+    resume_token = None
+    while True:
+        try:
+            async with db.watch(LIVE_EVENTS_PIPELINE, full_document="updateLookup",
+                                resume_after=resume_token) as stream:
+                live_events.publish_locally = False
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    try:
+                        dispatch_change(change)
+                    except Exception:
+                        logger.exception("Live event dispatch failed")
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                logger.warning("Change streams need a replica set; live events are published in-process")
+                live_events.publish_locally = True
+                return
+            # Typically the resume point has aged out of the oplog: start again from now
+            logger.warning(f"Live event stream failed, restarting: {e}")
+            resume_token = None
+            await asyncio.sleep(1)
+        except PyMongoError as e:
+            logger.warning(f"Live event stream interrupted: {e}")
+            await asyncio.sleep(1)
+
+def sse_message(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: ".encode('utf-8') + orjson.dumps(data, default=jsonable_encoder) + b"\n\n"
+
+# Bulk Import
+# Rows are validated one at a time and written in insert_many chunks, so memory
+# stays bounded by BULK_CHUNK_SIZE whatever the upload size.
+BULK_CHUNK_SIZE = 1000
+BULK_MAX_ERRORS = 1000
+
+def to_document(model: BaseModel) -> Dict[str, Any]:
+    doc = model.model_dump()
+    for key, value in doc.items():
+        if isinstance(value, datetime):
+            doc[key] = value.isoformat()
+    return doc
+
+def csv_rows(upload: UploadFile) -> Iterable[Dict[str, Any]]:
+    # UploadFile is spooled to disk past 1 MB; read it back a line at a time
+    reader = csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+
+async def bulk_insert(collection, orphanage_id: str, rows: Iterable[Dict[str, Any]],
+                      create_model, model, uploaded_by: Optional[str] = None) -> Dict[str, Any]:
+    # Inline data-URL images go to the media store like they do on the single-row routes
+    image_fields = IMAGE_FIELDS.get(collection.name, [])
+    total = inserted = 0
+    errors = []
+    batch, batch_rows = [], []
+    
+    def add_error(index: int, detail: Any):
+        if len(errors) < BULK_MAX_ERRORS:
+            errors.append({"row": index, "errors": detail})
+    
+    async def flush():
+        nonlocal inserted
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get('nInserted', 0)
+            for write_error in e.details.get('writeErrors', []):
+                add_error(batch_rows[write_error['index']], write_error.get('errmsg'))
+        batch.clear()
+        batch_rows.clear()
+    
+    for index, row in enumerate(rows):
+        total += 1
+        try:
+            data = create_model.model_validate(row)
+        except ValidationError as e:
+            add_error(index, e.errors(include_url=False, include_context=False))
+            continue
+        try:
+            fields = await externalize_images(data.model_dump(), image_fields, uploaded_by)
+        except HTTPException as e:
+            add_error(index, e.detail)
+            continue
+        batch.append(to_document(model(orphanage_id=orphanage_id, **fields)))
+        batch_rows.append(index)
+        if len(batch) >= BULK_CHUNK_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    
+    return {"inserted": inserted, "failed": total - inserted, "errors": errors}
+
+# Orphanage Search
+# In-process inverted index over the orphanage text fields. Query terms match
+# indexed terms exactly, by prefix, within one edit (a SymSpell-style deletion
+# neighbourhood, so transposed letters in short words still match) or by trigram
+# similarity, and hits are ranked by field weight. The list filters are kept per
+# document so they apply before the top SEARCH_MAX_RESULTS are cut. Each worker
+# refreshes its copy from Mongo every SEARCH_INDEX_TTL_SECONDS and applies its own
+# writes immediately.
+SEARCH_FIELDS = {"name": 3.0, "city": 2.0, "state": 2.0, "description": 1.0, "mission": 1.0}
+SEARCH_FILTER_FIELDS = ("city", "state", "type", "verification_status")
+SEARCH_INDEX_TTL_SECONDS = float(os.environ.get('SEARCH_INDEX_TTL_SECONDS', '60'))
+SEARCH_MAX_RESULTS = 200
+SEARCH_MIN_SIMILARITY = 0.5
+SEARCH_EDIT_MIN_LENGTH = 3
+
+def search_terms(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def term_trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def term_deletes(term: str) -> set:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def within_one_edit(a: str, b: str) -> bool:
+    # Optimal string alignment distance <= 1: one insert, delete, substitution or adjacent swap
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) != len(b):
+        shorter, longer = sorted((a, b), key=len)
+        return shorter in term_deletes(longer)
+    diffs = [i for i in range(len(a)) if a[i] != b[i]]
+    if len(diffs) == 2:
+        i, j = diffs
+        return j == i + 1 and a[i] == b[j] and a[j] == b[i]
+    return len(diffs) <= 1
+
+class OrphanageSearchIndex:
+    def __init__(self):
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.grams: Dict[str, set] = defaultdict(set)
+        self.gram_counts: Dict[str, int] = {}
+        self.deletes: Dict[str, set] = defaultdict(set)
+        self.doc_filters: Dict[str, Dict[str, Any]] = {}
+        self.loaded_at: Optional[float] = None
+    
+    def upsert(self, doc: Dict[str, Any]) -> None:
+        self.remove(doc['id'])
+        weights = defaultdict(float)
+        for field, weight in SEARCH_FIELDS.items():
+            for term in set(search_terms(doc.get(field) or "")):
+                weights[term] += weight
+        self.doc_terms[doc['id']] = dict(weights)
+        self.doc_filters[doc['id']] = {field: doc.get(field) for field in SEARCH_FILTER_FIELDS}
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                trigrams = term_trigrams(term)
+                self.gram_counts[term] = len(trigrams)
+                for gram in trigrams:
+                    self.grams[gram].add(term)
+                for variant in term_deletes(term) | {term}:
+                    self.deletes[variant].add(term)
+            self.postings[term][doc['id']] = weight
+    
+    def remove(self, doc_id: str) -> None:
+        self.doc_filters.pop(doc_id, None)
+        for term in self.doc_terms.pop(doc_id, {}):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                del self.gram_counts[term]
+                for gram in term_trigrams(term):
+                    self.grams[gram].discard(term)
+                for variant in term_deletes(term) | {term}:
+                    self.deletes[variant].discard(term)
+    
+    def load(self, docs: List[Dict[str, Any]]) -> None:
+        self.__init__()
+        for doc in docs:
+            self.upsert(doc)
+        self.loaded_at = time.monotonic()
+    
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > SEARCH_INDEX_TTL_SECONDS
+    
+    def matching_terms(self, query_term: str) -> Dict[str, float]:
+        query_grams = term_trigrams(query_term)
+        overlaps = defaultdict(int)
+        for gram in query_grams:
+            for term in self.grams.get(gram, ()):
+                overlaps[term] += 1
+        matches = {}
+        for term, overlap in overlaps.items():
+            if term == query_term:
+                matches[term] = 1.0
+            elif term.startswith(query_term):
+                matches[term] = 0.9
+            else:
+                similarity = 2 * overlap / (len(query_grams) + self.gram_counts[term])
+                if similarity >= SEARCH_MIN_SIMILARITY:
+                    matches[term] = 0.8 * similarity
+        if len(query_term) >= SEARCH_EDIT_MIN_LENGTH:
+            # Short words share too few trigrams for a typo to clear SEARCH_MIN_SIMILARITY
+            for variant in term_deletes(query_term) | {query_term}:
+                for term in self.deletes.get(variant, ()):
+                    if term not in matches and within_one_edit(query_term, term):
+                        matches[term] = 0.7
+        return matches
+    
+    def matches_filters(self, doc_id: str, filters: Dict[str, Any]) -> bool:
+        values = self.doc_filters.get(doc_id, {})
+        return all(values.get(field) == value for field, value in filters.items())
+    
+    def search(self, text: str, limit: int = SEARCH_MAX_RESULTS, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        query_terms = list(dict.fromkeys(search_terms(text)))
+        if not query_terms:
+            return []
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for query_term in query_terms:
+            best = {}
+            for term, similarity in self.matching_terms(query_term).items():
+                for doc_id, weight in self.postings[term].items():
+                    if filters and not self.matches_filters(doc_id, filters):
+                        continue
+                    best[doc_id] = max(best.get(doc_id, 0.0), similarity * weight)
+            for doc_id, score in best.items():
+                scores[doc_id] += score
+                matched[doc_id] += 1
+        # Documents matching every query term outrank partial matches
+        ranked = sorted(scores, key=lambda d: (matched[d], scores[d]), reverse=True)
+        return ranked[:limit]
+
+search_index = OrphanageSearchIndex()
+search_index_refresh: Optional[asyncio.Task] = None
+
+async def load_search_index() -> None:
+    try:
+        projection = {"_id": 0, "id": 1, **{field: 1 for field in (*SEARCH_FIELDS, *SEARCH_FILTER_FIELDS)}}
+        docs = await read_db.orphanages.find({}, projection).to_list(None)
+        search_index.load(docs)
+    except Exception:
+        logger.exception("Search index load failed")
+        raise
+
+async def get_search_index() -> OrphanageSearchIndex:
+    # Only the first load is waited on; after that a stale index keeps answering while it reloads
+    global search_index_refresh
+    if search_index.is_stale() and (search_index_refresh is None or search_index_refresh.done()):
+        search_index_refresh = asyncio.create_task(load_search_index())
+    if search_index.loaded_at is None:
+        await asyncio.shield(search_index_refresh)
+    return search_index
+
+# Pagination
+# Lists are ordered by (created_at, id) and paged with an opaque keyset cursor;
+# the cursor for the next page is returned in the X-Next-Cursor header.
+PAGE_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+
+def encode_cursor(doc: Dict[str, Any], keys: tuple = ("created_at", "id")) -> str:
+    raw = json.dumps([doc[key] for key in keys]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, types: tuple = (str, str)) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(types):
+            raise ValueError
+        return tuple(cast(value) for cast, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(query: Dict[str, Any], after: Optional[str]) -> Dict[str, Any]:
+    if not after:
+        return query
+    created_at, doc_id = decode_cursor(after)
+    keyset = {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "id": {"$gt": doc_id}}
+    ]}
+    return {"$and": [query, keyset]} if query else keyset
+
+async def fetch_page(collection, query: Dict[str, Any], limit: int, after: Optional[str],
+                     response: Response, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    projection = projection or {"_id": 0}
+    # An inclusion projection still needs the sort keys to build the next cursor
+    added = [key for key, _ in PAGE_SORT if 1 in projection.values() and key not in projection]
+    cursor = collection.find(after_cursor(query, after), {**projection, **{key: 1 for key in added}})
+    docs = await cursor.sort(PAGE_SORT).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(docs[-1])
+    for doc in docs:
+        for key in added:
+            doc.pop(key, None)
+    return docs
+
+def ndjson_export(collection, query: Dict[str, Any], after: Optional[str] = None,
+                  projection: Optional[Dict[str, Any]] = None) -> StreamingResponse:
+    async def rows():
+        cursor = collection.find(after_cursor(query, after), projection or {"_id": 0}).sort(PAGE_SORT)
+        async for doc in cursor.batch_size(EXPORT_BATCH_SIZE):
+            yield orjson.dumps(doc, default=jsonable_encoder) + b"\n"
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+# Indexes
+ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
+INDEX_SPECS = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "orphanages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+        IndexModel([("city", ASCENDING)], name="city"),
+        IndexModel([("state", ASCENDING)], name="state"),
+        IndexModel([("type", ASCENDING)], name="type"),
+        IndexModel([("verification_status", ASCENDING), ("city", ASCENDING)], name="verification_status_city"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+    ],
+    "donations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("donor_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="donor_created_at_id"),
+        IndexModel([("orphanage_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+                   name="orphanage_created_at_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel([("donor_id", ASCENDING), ("idempotency_key", ASCENDING)], name="donor_idempotency_key_unique",
+                   unique=True, partialFilterExpression={"idempotency_key": {"$type": "string"}}),
+    ],
+    "children": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("orphanage_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+                   name="orphanage_created_at_id"),
+    ],
+    "staff": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("orphanage_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+                   name="orphanage_created_at_id"),
+    ],
+    "analytics_rollups": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "report_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "donor_edges": [
+        IndexModel([("donor_id", ASCENDING), ("rollup_id", ASCENDING)], name="donor_rollup_unique", unique=True),
+    ],
+    "media": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "rate_limits": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "leases": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "funding_gaps": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category", ASCENDING), ("remaining", DESCENDING), ("id", ASCENDING)],
+                   name="category_remaining_id"),
+        IndexModel([("category", ASCENDING), ("city", ASCENDING), ("remaining", DESCENDING), ("id", ASCENDING)],
+                   name="category_city_remaining_id"),
+        IndexModel([("orphanage_id", ASCENDING)], name="orphanage_id"),
+    ],
+}
+
+# Representative filter/sort for every query the routes issue; check_query_plans
+# explains each one and flags any that fall back to a collection scan.
+ROUTE_QUERIES = [
+    ("login", "users", {"email": "x"}, None),
+    ("get_current_user", "users", {"id": "x"}, None),
+    ("get_orphanages:city", "orphanages", {"city": "x"}, None),
+    ("get_orphanages:state", "orphanages", {"state": "x"}, None),
+    ("get_orphanages:type", "orphanages", {"type": "x"}, None),
+    ("get_orphanages:verified", "orphanages", {"verification_status": "x"}, None),
+    ("get_orphanage_by_slug", "orphanages", {"slug": "x"}, None),
+    ("get_orphanages:near", "orphanages",
+     {"location": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [0, 0]}}}}, None),
+    ("orphanage_by_id", "orphanages", {"id": "x"}, None),
+    ("enrichment:orphanages", "orphanages", {"id": {"$in": ["x", "y"]}}, None),
+    ("enrichment:donors", "users", {"id": {"$in": ["x", "y"]}}, None),
+    ("get_my_donations", "donations", {"donor_id": "x"}, PAGE_SORT),
+    ("get_orphanage_donations", "donations", {"orphanage_id": "x"}, PAGE_SORT),
+    ("admin_get_all_donations", "donations", {}, PAGE_SORT),
+    ("admin_get_all_orphanages", "orphanages", {}, PAGE_SORT),
+    ("get_donation_receipt", "donations", {"id": "x"}, None),
+    ("create_donation:replay", "donations", {"donor_id": "x", "idempotency_key": "x"}, None),
+    ("recent_donations", "donations", {"orphanage_id": "x"}, [("created_at", DESCENDING)]),
+    ("period_totals", "donations", {"created_at": {"$gte": "x"}}, None),
+    ("get_children", "children", {"orphanage_id": "x"}, PAGE_SORT),
+    ("delete_child", "children", {"id": "x", "orphanage_id": "x"}, None),
+    ("get_staff", "staff", {"orphanage_id": "x"}, PAGE_SORT),
+    ("rollup_stats", "analytics_rollups", {"id": "x"}, None),
+    ("get_report", "report_jobs", {"id": "x"}, None),
+    ("donor_edges", "donor_edges", {"donor_id": "x", "rollup_id": "x"}, None),
+    ("get_media", "media", {"id": "x"}, None),
+    ("rate_limit", "rate_limits", {"id": "x"}, None),
+    ("get_funding_gaps", "funding_gaps", {"category": "x", "remaining": {"$gt": 0}}, FUNDING_GAP_SORT),
+    ("get_funding_gaps:city", "funding_gaps", {"category": "x", "city": "x", "remaining": {"$gt": 0}},
+     FUNDING_GAP_SORT),
+]
+
+async def building_indexes() -> List[Dict[str, Any]]:
+    try:
+        ops = await client.admin.aggregate([
+            {"$currentOp": {"allUsers": True}},
+            {"$match": {"command.createIndexes": {"$exists": True}}}
+        ]).to_list(None)
+    except PyMongoError:
+        return []
+    return [{"ns": op.get('ns'), "indexes": [i.get('name') for i in op['command'].get('indexes', [])],
+             "progress": op.get('progress')} for op in ops]
+
+async def index_status() -> Dict[str, Any]:
+    report = {}
+    for collection, models in INDEX_SPECS.items():
+        existing = await db[collection].index_information()
+        names = [model.document['name'] for model in models]
+        report[collection] = {
+            "present": [name for name in names if name in existing],
+            "missing": [name for name in names if name not in existing]
+        }
+    return {"collections": report, "building": await building_indexes()}
+
+async def ensure_indexes() -> Dict[str, Any]:
+    # Idempotent: only builds indexes that are not there yet, and one failure
+    # (e.g. duplicates blocking a unique index) does not stop the others
+    report = {}
+    for collection, models in INDEX_SPECS.items():
+        existing = await db[collection].index_information()
+        created, failed = [], {}
+        for model in models:
+            name = model.document['name']
+            if name in existing:
+                continue
+            try:
+                await db[collection].create_indexes([model])
+                created.append(name)
+            except PyMongoError as e:
+                failed[name] = str(e)
+                logger.error(f"Failed to create index {collection}.{name}: {e}")
+        if created:
+            logger.info(f"Created indexes on {collection}: {', '.join(created)}")
+        report[collection] = {"created": created, "failed": failed}
+    return report
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages += plan_stages(child)
+    return [stage for stage in stages if stage]
+
+async def check_query_plans() -> List[Dict[str, Any]]:
+    results = []
+    for route, collection, query, sort in ROUTE_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = plan_stages(explain['queryPlanner']['winningPlan'])
+        results.append({"route": route, "collection": collection, "stages": stages,
+                        "collscan": "COLLSCAN" in stages})
+    return results
+
+# Donation Writes
+# Requires a replica set; on a standalone mongod the orphanage total is bumped
+# first and taken back if the insert then fails, so a donation row (and the
+# change-stream event it triggers) only ever appears once it is fully applied.
+DONATION_TRANSACTIONS = os.environ.get('DONATION_TRANSACTIONS', 'false').lower() == 'true'
+
+class OrphanageMissing(Exception):
+    pass
+
+async def increment_total(orphanage_id: str, amount: float, session=None) -> None:
+    # The $inc doubles as the existence check: no matching orphanage, no donation
+    result = await db.orphanages.update_one(
+        {"id": orphanage_id},
+        {"$inc": {"total_donations": amount}},
+        session=session
+    )
+    if not result.matched_count:
+        raise OrphanageMissing()
+
+async def write_donation(doc: Dict[str, Any]) -> None:
+    if DONATION_TRANSACTIONS:
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                await db.donations.insert_one(doc, session=session)
+                await increment_total(doc['orphanage_id'], doc['amount'], session)
+        return
+    await increment_total(doc['orphanage_id'], doc['amount'])
+    try:
+        await db.donations.insert_one(doc)
+    except BaseException:
+        # Duplicate idempotency key, or the insert never landed: undo the total
+        await db.orphanages.update_one({"id": doc['orphanage_id']}, {"$inc": {"total_donations": -doc['amount']}})
+        raise
+
+# Donation Queue
+# Optional write-behind mode (DONATION_WRITE_MODE=queued): accepted donations are
+# appended to a local SQLite WAL log and a background consumer flushes them to
+# Mongo in batches, coalescing the total_donations $inc per orphanage. Rows move
+# QUEUED -> INSERTED -> deleted, so a restart replays whatever is left; each
+# orphanage keeps the last queue seq counted in its total (queue_applied.<queue id>,
+# set in the same update as the $inc) so a replay never counts a row twice. Only
+# the worker holding the lock file consumes; every worker may append.
+DONATION_WRITE_MODE = os.environ.get('DONATION_WRITE_MODE', 'sync')
+DONATION_QUEUE_PATH = Path(os.environ.get('DONATION_QUEUE_PATH', str(ROOT_DIR / 'donation_queue.db')))
+DONATION_QUEUE_BATCH_SIZE = int(os.environ.get('DONATION_QUEUE_BATCH_SIZE', '500'))
+DONATION_QUEUE_FLUSH_INTERVAL = float(os.environ.get('DONATION_QUEUE_FLUSH_INTERVAL', '0.5'))
+QUEUED, INSERTED = 0, 1
+
+class DonationQueue:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn: Optional[sqlite3.Connection] = None
+        self.consumer_lock = None
+        self.queue_id: Optional[str] = None
+    
+    def open(self) -> None:
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS donations ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT NOT NULL UNIQUE,"
+            " donor_id TEXT NOT NULL,"
+            " idempotency_key TEXT,"
+            " state INTEGER NOT NULL DEFAULT 0,"
+            " doc TEXT NOT NULL,"
+            " UNIQUE (donor_id, idempotency_key))"
+        )
+        # Seqs only mean something within one log file; a recreated file gets a new id
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('queue_id', ?)", (uuid.uuid4().hex,))
+        self.queue_id = self.conn.execute("SELECT value FROM meta WHERE key = 'queue_id'").fetchone()[0]
+    
+    def close(self) -> None:
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+        if self.consumer_lock:
+            self.consumer_lock.close()
+            self.consumer_lock = None
+    
+    def try_become_consumer(self) -> bool:
+        if self.consumer_lock:
+            return True
+        handle = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.consumer_lock = handle
+        return True
+    
+    def append(self, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Returns the already-queued donation when the idempotency key was seen before
+        with self.lock:
+            try:
+                self.conn.execute(
+                    "INSERT INTO donations (id, donor_id, idempotency_key, doc) VALUES (?, ?, ?, ?)",
+                    (doc['id'], doc['donor_id'], doc.get('idempotency_key'), json.dumps(doc))
+                )
+                return None
+            except sqlite3.IntegrityError:
+                row = self.conn.execute(
+                    "SELECT doc FROM donations WHERE donor_id = ? AND idempotency_key = ?",
+                    (doc['donor_id'], doc.get('idempotency_key'))
+                ).fetchone()
+                if row is None:
+                    raise
+                return json.loads(row[0])
+    
+    def pending(self, limit: int) -> List[tuple]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, state, doc FROM donations ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(seq, state, json.loads(doc)) for seq, state, doc in rows]
+    
+    def mark_inserted(self, seqs: List[int]) -> None:
+        with self.lock:
+            self.conn.executemany("UPDATE donations SET state = ? WHERE seq = ?", [(INSERTED, seq) for seq in seqs])
+    
+    def remove(self, seqs: List[int]) -> None:
+        with self.lock:
+            self.conn.executemany("DELETE FROM donations WHERE seq = ?", [(seq,) for seq in seqs])
+
+donation_queue = DonationQueue(DONATION_QUEUE_PATH)
+
+async def apply_queued_totals(rows: List[tuple]) -> List[Dict[str, Any]]:
+    # Returns the donations whose totals were applied now; rows at or below an
+    # orphanage's watermark were counted by a pass that crashed before removing them
+    field = f"queue_applied.{donation_queue.queue_id}"
+    orphanage_ids = list({doc['orphanage_id'] for _, doc in rows})
+    watermarks = {}
+    async for orphanage in db.orphanages.find({"id": {"$in": orphanage_ids}}, {"_id": 0, "id": 1, field: 1}):
+        watermarks[orphanage['id']] = orphanage.get('queue_applied', {}).get(donation_queue.queue_id, 0)
+    fresh = [(seq, doc) for seq, doc in rows if seq > watermarks.get(doc['orphanage_id'], 0)]
+    
+    totals, last_seq = defaultdict(float), defaultdict(int)
+    for seq, doc in fresh:
+        totals[doc['orphanage_id']] += doc['amount']
+        last_seq[doc['orphanage_id']] = max(last_seq[doc['orphanage_id']], seq)
+    if totals:
+        await db.orphanages.bulk_write([
+            UpdateOne({"id": orphanage_id, field: {"$not": {"$gte": last_seq[orphanage_id]}}},
+                      {"$inc": {"total_donations": amount}, "$set": {field: last_seq[orphanage_id]}})
+            for orphanage_id, amount in totals.items()
+        ], ordered=False)
+    return [doc for _, doc in fresh]
+
+async def flush_donation_queue() -> int:
+    rows = await asyncio.to_thread(donation_queue.pending, DONATION_QUEUE_BATCH_SIZE)
+    if not rows:
+        return 0
+    
+    fresh = [(seq, doc) for seq, state, doc in rows if state == QUEUED]
+    applied = [(seq, doc) for seq, state, doc in rows if state == INSERTED]
+    if applied:
+        # Crashed between marking and removing; the watermarks skip whatever was counted
+        logger.warning(f"Replaying {len(applied)} donations from the queue log")
+    dropped, retry = [], set()
+    if fresh:
+        try:
+            await db.donations.insert_many([dict(doc) for _, doc in fresh], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                seq, doc = fresh[error['index']]
+                key_pattern = error.get('keyPattern') or {}
+                if error.get('code') == 11000 and 'idempotency_key' in key_pattern:
+                    dropped.append(seq)
+                elif error.get('code') != 11000:
+                    # Transient failure: leave it queued for the next pass
+                    logger.error(f"Queued donation {doc['id']} failed to persist: {error.get('errmsg')}")
+                    retry.add(seq)
+                # A duplicate id means an earlier run inserted it before crashing
+        inserted = [(seq, doc) for seq, doc in fresh if seq not in retry and seq not in dropped]
+        await asyncio.to_thread(donation_queue.mark_inserted, [seq for seq, _ in inserted])
+        applied += inserted
+    if retry:
+        # Hold back everything after the first retried row, or the watermark would
+        # move past it and its total would be skipped once it does get inserted
+        applied = [(seq, doc) for seq, doc in applied if seq < min(retry)]
+    
+    if applied:
+        # Rollups and funding gaps are not watermarked: a crash between the totals and
+        # these leaves them short (python manage.py rebuild-rollups repairs them)
+        counted = await apply_queued_totals(applied)
+        if counted:
+            await apply_donation_rollups(counted)
+            await apply_donation_funding_gaps(counted)
+            await publish_donation_events(counted)
+            response_cache.invalidate("orphanages")
+    
+    await asyncio.to_thread(donation_queue.remove, [seq for seq, _ in applied] + dropped)
+    return len(rows)
+
+async def run_donation_queue() -> None:
+    while True:
+        flushed = 0
+        try:
+            if await asyncio.to_thread(donation_queue.try_become_consumer):
+                flushed = await flush_donation_queue()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Donation queue flush failed")
+        if flushed < DONATION_QUEUE_BATCH_SIZE:
+            await asyncio.sleep(DONATION_QUEUE_FLUSH_INTERVAL)
+
+async def enqueue_donation(doc: Dict[str, Any]) -> Dict[str, Any]:
+    if not await db.orphanages.find_one({"id": doc['orphanage_id']}, {"_id": 0, "id": 1}):
+        raise OrphanageMissing()
+    if doc.get('idempotency_key'):
+        existing = await db.donations.find_one(
+            {"donor_id": doc['donor_id'], "idempotency_key": doc['idempotency_key']},
+            {"_id": 0, "idempotency_key": 0}
+        )
+        if existing:
+            return existing
+    queued = await asyncio.to_thread(donation_queue.append, doc)
+    if queued:
+        queued.pop('idempotency_key', None)
+        return {**queued, "payment_status": PaymentStatus.PENDING}
+    return {**doc, "payment_status": PaymentStatus.PENDING}
+
+# Reporting
+# Donations are streamed from Mongo in REPORT_BATCH_SIZE chunks; each chunk becomes
+# a DataFrame (breakdown dicts flattened into one column per category) and is
+# either appended to the output file or folded into a running aggregate, so
+# memory is bounded by the batch and the size of the aggregate, not the history.
+REPORTS_DIR = Path(os.environ.get('REPORTS_DIR', str(ROOT_DIR / 'reports')))
+REPORT_BATCH_SIZE = int(os.environ.get('REPORT_BATCH_SIZE', '50000'))
+REPORT_STALE_SECONDS = 300
+REPORT_COLUMNS = ["id", "created_at", "donor_id", "orphanage_id", "amount", "payment_status",
+                  "is_anonymous", "gateway_reference"]
+REPORT_STRING_COLUMNS = ["id", "created_at", "donor_id", "orphanage_id", "payment_status", "gateway_reference"]
+CATEGORY_COLUMNS = [category.value for category in DonationCategory]
+report_tasks: Dict[str, asyncio.Task] = {}
+
+def donations_frame(docs: List[Dict[str, Any]]) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(docs, columns=REPORT_COLUMNS)
+    frame[REPORT_STRING_COLUMNS] = frame[REPORT_STRING_COLUMNS].astype("string")
+    frame['amount'] = frame['amount'].astype(float)
+    frame['is_anonymous'] = frame['is_anonymous'].fillna(False).astype(bool)
+    frame['year'] = frame['created_at'].str.slice(0, 4)
+    
+    breakdown = pd.DataFrame.from_records([doc.get('breakdown') or {} for doc in docs], index=frame.index)
+    categories = breakdown.reindex(columns=CATEGORY_COLUMNS).astype(float).fillna(0.0)
+    unknown = [column for column in breakdown.columns if column not in CATEGORY_COLUMNS]
+    if unknown:
+        categories[DonationCategory.OTHER.value] += breakdown[unknown].astype(float).fillna(0.0).sum(axis=1)
+    return pd.concat([frame, categories], axis=1)
+
+def aggregate_frame(frame: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    return frame.groupby(keys, as_index=False).agg(
+        donations=("id", "count"),
+        total_amount=("amount", "sum"),
+        first_donation=("created_at", "min"),
+        last_donation=("created_at", "max"),
+        **{column: (column, "sum") for column in CATEGORY_COLUMNS}
+    )
+
+def merge_aggregates(total: Optional[pd.DataFrame], partial: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    if total is None:
+        return partial
+    return pd.concat([total, partial]).groupby(keys, as_index=False).agg(
+        donations=("donations", "sum"),
+        total_amount=("total_amount", "sum"),
+        first_donation=("first_donation", "min"),
+        last_donation=("last_donation", "max"),
+        **{column: (column, "sum") for column in CATEGORY_COLUMNS}
+    )
+
+class ReportWriter:
+    def __init__(self, path: Path, format: ReportFormat):
+        self.path = path
+        self.format = format
+        self.parquet_writer = None
+        self.started = False
+    
+    def write(self, frame: pd.DataFrame) -> None:
+        if self.format == ReportFormat.PARQUET:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(str(self.path), table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self.started else "w", header=not self.started, index=False)
+        self.started = True
+    
+    def close(self) -> None:
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        elif not self.started:
+            self.path.write_text("")
+
+def report_path(job: Dict[str, Any]) -> Path:
+    return REPORTS_DIR / f"{job['id']}.{job['format'].lower()}"
+
+async def iter_donation_batches(year: Optional[int]):
+    query = {}
+    if year:
+        query['created_at'] = {"$gte": f"{year}-01-01", "$lt": f"{year + 1}-01-01"}
+    projection = {"_id": 0, "breakdown": 1, **{column: 1 for column in REPORT_COLUMNS}}
+    cursor = read_db.donations.find(query, projection).sort(PAGE_SORT).batch_size(min(REPORT_BATCH_SIZE, 10000))
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= REPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def attach_names(frame: pd.DataFrame, collection, id_column: str, fields: Dict[str, str]) -> pd.DataFrame:
+    names = {}
+    ids = frame[id_column].dropna().unique().tolist()
+    for start in range(0, len(ids), REPORT_BATCH_SIZE):
+        names.update(await find_by_ids(collection, ids[start:start + REPORT_BATCH_SIZE], {f: 1 for f in fields}))
+    for field, column in reversed(list(fields.items())):
+        frame.insert(1, column, frame[id_column].map(lambda i: names.get(i, {}).get(field)))
+    return frame
+
+async def build_report(job: Dict[str, Any]) -> int:
+    kind = job['kind']
+    writer = ReportWriter(report_path(job), job['format'])
+    rows = 0
+    total = None
+    keys = ["donor_id", "year"] if kind == ReportKind.DONOR_STATEMENTS else ["orphanage_id", "year"]
+    try:
+        async for batch in iter_donation_batches(job.get('year')):
+            await report_heartbeat(job['id'])
+            frame = await asyncio.to_thread(donations_frame, batch)
+            if kind == ReportKind.DONATIONS:
+                await asyncio.to_thread(writer.write, frame.drop(columns=["year"]))
+                rows += len(frame)
+            else:
+                partial = await asyncio.to_thread(aggregate_frame, frame, keys)
+                total = await asyncio.to_thread(merge_aggregates, total, partial, keys)
+        
+        if kind != ReportKind.DONATIONS and total is not None:
+            if kind == ReportKind.DONOR_STATEMENTS:
+                total = await attach_names(total, read_db.users, "donor_id", {"name": "donor_name", "email": "donor_email"})
+            else:
+                total = await attach_names(total, read_db.orphanages, "orphanage_id", {"name": "orphanage_name"})
+            total = total.sort_values(keys)
+            await asyncio.to_thread(writer.write, total)
+            rows = len(total)
+    finally:
+        await asyncio.to_thread(writer.close)
+    return rows
+
+async def report_heartbeat(job_id: str) -> None:
+    await db.report_jobs.update_one({"id": job_id}, {"$set": {"heartbeat_at": datetime.now(timezone.utc).isoformat()}})
+
+def report_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    # Jobs run inside a worker; one that stopped heartbeating died with it
+    if job['status'] in (ReportStatus.PENDING, ReportStatus.RUNNING):
+        heartbeat = datetime.fromisoformat(job.get('heartbeat_at') or job['created_at'])
+        if (datetime.now(timezone.utc) - heartbeat).total_seconds() > REPORT_STALE_SECONDS:
+            job = {**job, "status": ReportStatus.FAILED, "error": "Interrupted before completion"}
+    return job
+
+async def run_report_job(job: Dict[str, Any]) -> None:
+    await db.report_jobs.update_one({"id": job['id']}, {"$set": {"status": ReportStatus.RUNNING}})
+    update = {}
+    try:
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        update['rows'] = await build_report(job)
+        update['status'] = ReportStatus.COMPLETED
+    except Exception as e:
+        logger.exception(f"Report job {job['id']} failed")
+        update.update(status=ReportStatus.FAILED, error=str(e))
+    update['completed_at'] = datetime.now(timezone.utc).isoformat()
+    await db.report_jobs.update_one({"id": job['id']}, {"$set": update})
+    report_tasks.pop(job['id'], None)
+
+# Media Store
+# Images are stored once under the sha256 of their bytes, on local disk or in an
+# S3-compatible bucket, together with pre-rendered resized variants. Documents keep
+# only the short URL; since a hash never changes content, responses are immutable.
+MEDIA_BACKEND = os.environ.get('MEDIA_BACKEND', 'local')
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', str(ROOT_DIR / 'media')))
+MEDIA_S3_BUCKET = os.environ.get('MEDIA_S3_BUCKET')
+MEDIA_S3_ENDPOINT_URL = os.environ.get('MEDIA_S3_ENDPOINT_URL')
+MEDIA_S3_PREFIX = os.environ.get('MEDIA_S3_PREFIX', 'media/')
+MEDIA_PUBLIC_URL = os.environ.get('MEDIA_PUBLIC_URL', '/api/media').rstrip('/')
+MEDIA_MAX_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', str(10 * 1024 * 1024)))
+MEDIA_MAX_PIXELS = 50_000_000
+MEDIA_VARIANTS = {"thumb": 160, "card": 640, "large": 1600}
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "GIF": "image/gif", "WEBP": "image/webp"}
+IMAGE_FIELDS = {
+    "orphanages": ["logo", "cover_image", "gallery"],
+    "children": ["photo"],
+    "users": ["profile_picture"],
+}
+MEDIA_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+DATA_URL_RE = re.compile(r'^data:[^,]*;base64,', re.IGNORECASE)
+
+class LocalMediaStorage:
+    def __init__(self, root: Path):
+        self.root = root
+    
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+    
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        path = self.path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    
+    async def response(self, key: str, content_type: str, headers: Dict[str, str]) -> Optional[Response]:
+        path = self.path(key)
+        if not path.exists():
+            return None
+        return FileResponse(path, media_type=content_type, headers=headers)
+
+class S3MediaStorage:
+    def __init__(self, bucket: str, endpoint_url: Optional[str], prefix: str):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+    
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data,
+                               ContentType=content_type, CacheControl=MEDIA_CACHE_CONTROL)
+    
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+    
+    async def response(self, key: str, content_type: str, headers: Dict[str, str]) -> Optional[Response]:
+        data = await asyncio.to_thread(self.get, key)
+        if data is None:
+            return None
+        return Response(content=data, media_type=content_type, headers=headers)
+
+def create_media_storage():
+    if MEDIA_BACKEND == "s3":
+        return S3MediaStorage(MEDIA_S3_BUCKET, MEDIA_S3_ENDPOINT_URL, MEDIA_S3_PREFIX)
+    return LocalMediaStorage(MEDIA_ROOT)
+
+media_storage = create_media_storage()
+# Media documents never change, so they can be cached for as long as memory allows
+media_cache = TTLCache(10000, 24 * 3600)
+
+def media_url(digest: str, variant: Optional[str] = None) -> str:
+    return f"{MEDIA_PUBLIC_URL}/{digest}/{variant}" if variant else f"{MEDIA_PUBLIC_URL}/{digest}"
+
+def media_key(digest: str, variant: Optional[str] = None) -> str:
+    return f"{digest}.{variant}" if variant else digest
+
+def render_media(data: bytes) -> Dict[str, Any]:
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        image = Image.open(io.BytesIO(data))
+        if image.format not in MEDIA_TYPES:
+            raise HTTPException(status_code=415, detail=f"Unsupported image format {image.format}")
+        if image.width * image.height > MEDIA_MAX_PIXELS:
+            raise HTTPException(status_code=413, detail="Image dimensions too large")
+        source_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid image")
+    
+    variants = {}
+    has_alpha = image.mode in ("RGBA", "LA", "P") and (image.mode != "P" or "transparency" in image.info)
+    for name, size in MEDIA_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        if has_alpha:
+            resized.save(buffer, "PNG", optimize=True)
+            content_type = "image/png"
+        else:
+            resized.convert("RGB").save(buffer, "JPEG", quality=82, optimize=True, progressive=True)
+            content_type = "image/jpeg"
+        variants[name] = {"data": buffer.getvalue(), "content_type": content_type,
+                          "width": resized.width, "height": resized.height}
+    return {"content_type": MEDIA_TYPES[source_format], "width": image.width, "height": image.height,
+            "variants": variants}
+
+def media_view(media: Dict[str, Any]) -> Dict[str, Any]:
+    return {**media, "url": media_url(media['id']),
+            "variants": {name: {**info, "url": media_url(media['id'], name)} for name, info in media['variants'].items()}}
+
+def write_media(digest: str, data: bytes, rendered: Dict[str, Any]) -> None:
+    for name, variant in rendered['variants'].items():
+        media_storage.put(media_key(digest, name), variant.pop('data'), variant['content_type'])
+    # The original goes last: its presence marks the whole set as written
+    media_storage.put(media_key(digest), data, rendered['content_type'])
+
+async def store_media(data: bytes, uploaded_by: Optional[str] = None) -> Dict[str, Any]:
+    if len(data) > MEDIA_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {MEDIA_MAX_BYTES} bytes")
+    digest = hashlib.sha256(data).hexdigest()
+    existing = await get_media(digest)
+    if existing:
+        return existing
+    
+    rendered = await asyncio.to_thread(render_media, data)
+    await asyncio.to_thread(write_media, digest, data, rendered)
+    media = {
+        "id": digest,
+        "content_type": rendered['content_type'],
+        "size": len(data),
+        "width": rendered['width'],
+        "height": rendered['height'],
+        "variants": rendered['variants'],
+        "uploaded_by": uploaded_by,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    try:
+        await db.media.update_one({"id": digest}, {"$setOnInsert": media}, upsert=True)
+    except DuplicateKeyError:
+        # Same bytes uploaded concurrently; either copy is identical
+        pass
+    media_cache.set(digest, media)
+    return media
+
+async def get_media(digest: str) -> Optional[Dict[str, Any]]:
+    media = media_cache.get(digest)
+    if media is None:
+        media = await db.media.find_one({"id": digest}, {"_id": 0})
+        if media:
+            media_cache.set(digest, media)
+    return media
+
+async def externalize_image(value: Any, uploaded_by: Optional[str] = None) -> Any:
+    if not isinstance(value, str) or not DATA_URL_RE.match(value):
+        return value
+    try:
+        data = base64.b64decode(value[value.index(',') + 1:], validate=True)
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Invalid image data URL")
+    media = await store_media(data, uploaded_by)
+    return media_url(media['id'])
+
+async def externalize_images(doc: Dict[str, Any], fields: List[str], uploaded_by: Optional[str] = None) -> Dict[str, Any]:
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, list):
+            doc[field] = [await externalize_image(item, uploaded_by) for item in value]
+        elif value:
+            doc[field] = await externalize_image(value, uploaded_by)
+    return doc
+
+async def migrate_inline_media() -> Dict[str, Dict[str, int]]:
+    report = {}
+    for collection_name, fields in IMAGE_FIELDS.items():
+        collection = db[collection_name]
+        query = {"$or": [{field: {"$regex": "^data:"}} for field in fields]}
+        projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+        migrated = failed = 0
+        async for doc in collection.find(query, projection):
+            try:
+                updates = await externalize_images({field: doc.get(field) for field in fields}, fields)
+            except HTTPException as e:
+                logger.warning(f"Skipping {collection_name} {doc['id']}: {e.detail}")
+                failed += 1
+                continue
+            await collection.update_one({"id": doc['id']}, {"$set": updates})
+            migrated += 1
+        report[collection_name] = {"migrated": migrated, "failed": failed}
+    return report
+
+# Orphanage Views
+# List routes take view=card (what OrphanageCard renders) or an explicit fields=
+# list; either becomes a Mongo projection so unused fields never leave the server.
+ORPHANAGE_CARD_FIELDS = ["id", "slug", "name", "city", "state", "type", "verification_status", "logo",
+                         "cover_image", "description", "mission", "total_children", "total_donations",
+                         "monthly_targets.MEALS"]
+ORPHANAGE_CARD_VARIANTS = {"logo": "thumb", "cover_image": "card"}
+# queue_applied holds the donation queue's replay watermarks, internal like the GeoJSON point
+ORPHANAGE_FULL_PROJECTION = {"_id": 0, "location": 0, "queue_applied": 0}
+
+def orphanage_projection(view: OrphanageView, fields: Optional[str]) -> Dict[str, Any]:
+    if fields:
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in Orphanage.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return {"_id": 0, "id": 1, **{field: 1 for field in requested}}
+    if view == OrphanageView.CARD:
+        return {"_id": 0, **{field: 1 for field in ORPHANAGE_CARD_FIELDS}}
+    return ORPHANAGE_FULL_PROJECTION
+
+def media_variant_url(url: Any, variant: str) -> Any:
+    # Only bare media URLs have variants; external links are passed through
+    if isinstance(url, str) and url.startswith(MEDIA_PUBLIC_URL + "/") and MEDIA_HASH_RE.match(url.rsplit('/', 1)[-1]):
+        return f"{url}/{variant}"
+    return url
+
+def card_view(orphanages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for orphanage in orphanages:
+        for field, variant in ORPHANAGE_CARD_VARIANTS.items():
+            if orphanage.get(field):
+                orphanage[field] = media_variant_url(orphanage[field], variant)
+    return orphanages
+
+# Geo Search
+# Orphanages carry a GeoJSON point in `location` (2dsphere indexed). One created
+# without coordinates is placed at its city's centroid from the bundled table and
+# marked location_source="city_centroid" until precise coordinates are supplied.
+CITY_CENTROIDS_PATH = ROOT_DIR / 'data' / 'city_centroids.csv'
+MAX_NEAR_RADIUS_KM = 1000
+city_centroids: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+def normalize_place(name: Optional[str]) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', (name or '').lower()).strip()
+
+def get_city_centroids() -> Dict[str, List[Dict[str, Any]]]:
+    global city_centroids
+    if city_centroids is None:
+        table = defaultdict(list)
+        with open(CITY_CENTROIDS_PATH, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                entry = {"state": normalize_place(row['state']),
+                         "latitude": float(row['latitude']), "longitude": float(row['longitude'])}
+                for name in [row['city'], *filter(None, (row.get('aliases') or '').split('|'))]:
+                    table[normalize_place(name)].append(entry)
+        city_centroids = dict(table)
+    return city_centroids
+
+def geocode_city(city: Optional[str], state: Optional[str]) -> Optional[tuple]:
+    candidates = get_city_centroids().get(normalize_place(city), [])
+    for candidate in candidates:
+        if candidate['state'] == normalize_place(state):
+            return candidate['latitude'], candidate['longitude']
+    # Missing or misspelt state: trust the city name only when it is unambiguous
+    if len(candidates) == 1:
+        return candidates[0]['latitude'], candidates[0]['longitude']
+    return None
+
+def geo_point(latitude: float, longitude: float) -> Dict[str, Any]:
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+def location_fields(latitude: Optional[float], longitude: Optional[float],
+                    city: Optional[str], state: Optional[str]) -> Dict[str, Any]:
+    if latitude is not None and longitude is not None:
+        return {"latitude": latitude, "longitude": longitude,
+                "location": geo_point(latitude, longitude), "location_source": "provided"}
+    centroid = geocode_city(city, state)
+    if not centroid:
+        return {}
+    return {"latitude": centroid[0], "longitude": centroid[1],
+            "location": geo_point(*centroid), "location_source": "city_centroid"}
+
+def parse_coordinates(latitude: Any, longitude: Any) -> tuple:
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="latitude and longitude must be given together as numbers")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(status_code=400, detail="Coordinates out of range")
+    return latitude, longitude
+
+async def find_near(query: Dict[str, Any], projection: Dict[str, Any], latitude: float, longitude: float,
+                    radius_km: Optional[float], limit: int, after: Optional[str],
+                    response: Response) -> List[Dict[str, Any]]:
+    geo_near = {"near": geo_point(latitude, longitude), "key": "location", "spherical": True, "query": query,
+                "distanceField": "distance_km", "distanceMultiplier": 0.001}
+    if radius_km:
+        geo_near['maxDistance'] = radius_km * 1000
+    pipeline = [{"$geoNear": geo_near}]
+    if after:
+        distance, doc_id = decode_cursor(after, (float, str))
+        # minDistance skips what earlier pages covered; ties at the boundary are split by id
+        geo_near['minDistance'] = max(0.0, distance * 1000 - 1)
+        pipeline.append({"$match": {"$or": [
+            {"distance_km": {"$gt": distance}},
+            {"distance_km": distance, "id": {"$gt": doc_id}}
+        ]}})
+    # Orphanages placed at the same city centroid tie on distance, so id breaks ties
+    pipeline += [{"$sort": {"distance_km": 1, "id": 1}}, {"$limit": limit + 1}]
+    pipeline.append({"$project": {**projection, "distance_km": 1} if 1 in projection.values() else projection})
+    docs = await read_db.orphanages.aggregate(pipeline).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(docs[-1], ("distance_km", "id"))
+    return docs
+
+async def geocode_orphanages() -> Dict[str, Any]:
+    # Backfills orphanages with no location, from their own coordinates or their city
+    located = 0
+    unmatched = defaultdict(int)
+    ops = []
+    projection = {"_id": 0, "id": 1, "city": 1, "state": 1, "latitude": 1, "longitude": 1}
+    async for doc in db.orphanages.find({"location": None}, projection):
+        fields = location_fields(doc.get('latitude'), doc.get('longitude'), doc.get('city'), doc.get('state'))
+        if not fields:
+            unmatched[f"{doc.get('city')}, {doc.get('state')}"] += 1
+            continue
+        ops.append(UpdateOne({"id": doc['id']}, {"$set": fields}))
+        if len(ops) >= BULK_CHUNK_SIZE:
+            await db.orphanages.bulk_write(ops, ordered=False)
+            located += len(ops)
+            ops = []
+    if ops:
+        await db.orphanages.bulk_write(ops, ordered=False)
+        located += len(ops)
+    return {"located": located, "unmatched": sum(unmatched.values()), "unmatched_places": dict(unmatched)}
+
+# Admission Control
+# Expensive routes take `dependencies=[Depends(admit(name, by))]`. A token bucket
+# per (route, client) rejects bursts with 429, keyed by IP or by the JWT's user;
+# buckets live in memory per worker, or in Mongo (RATE_LIMIT_BACKEND=mongo) so
+# every worker shares them. Routes with a concurrency cap queue briefly for a
+# slot and are shed with 503 once the queue is full or the wait runs out. Both
+# responses carry Retry-After. Behind TRUSTED_PROXY_HOPS reverse proxies the client
+# IP comes from X-Forwarded-For instead of the socket peer.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', '16'))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', '0.5'))
+
+def parse_rate(value: str) -> tuple:
+    # "10/60": bursts of up to 10 requests, refilled at 10 per 60 seconds
+    requests, seconds = value.split('/')
+    return int(requests), int(requests) / float(seconds)
+
+RATE_LIMITS = {
+    "login": parse_rate(os.environ.get('RATE_LIMIT_LOGIN', '10/60')),
+    "register": parse_rate(os.environ.get('RATE_LIMIT_REGISTER', '5/300')),
+    "search": parse_rate(os.environ.get('RATE_LIMIT_SEARCH', '60/60')),
+    "analytics": parse_rate(os.environ.get('RATE_LIMIT_ANALYTICS', '30/60')),
+    "reports": parse_rate(os.environ.get('RATE_LIMIT_REPORTS', '5/300')),
+}
+CONCURRENCY_LIMITS = {
+    "search": int(os.environ.get('CONCURRENCY_LIMIT_SEARCH', '8')),
+    "analytics": int(os.environ.get('CONCURRENCY_LIMIT_ANALYTICS', '4')),
+}
+
+admission_decisions = Counter("admission_decisions_total", "Admission control decisions by route and outcome")
+admission_queue_wait = Histogram("admission_queue_wait_seconds", "Time spent queued for a concurrency slot",
+                                 LATENCY_BUCKETS)
+
+class MemoryRateLimitStore:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets: OrderedDict = OrderedDict()
+    
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        # Returns 0 when a token was taken, else the seconds until one is available
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+class MongoRateLimitStore:
+    # One atomic pipeline update per request; $$NOW keeps every worker on the server's clock
+    def __init__(self, collection):
+        self.collection = collection
+    
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        bucket = await self.collection.find_one_and_update({"id": key}, [
+            {"$set": {
+                "tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]},
+                "updated_at": "$$NOW"
+            }},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": {"$add": ["$$NOW", int(capacity / rate * 1000)]}
+            }},
+        ], projection={"_id": 0, "tokens": 1, "allowed": 1}, upsert=True, return_document=ReturnDocument.AFTER)
+        return 0.0 if bucket['allowed'] else (1 - bucket['tokens']) / rate
+
+def create_rate_limit_store():
+    if RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimitStore(db.rate_limits)
+    return MemoryRateLimitStore(RATE_LIMIT_MAX_KEYS)
+
+rate_limit_store = create_rate_limit_store()
+
+class ConcurrencyLimiter:
+    # Per worker: the cap protects this process's event loop and pool, so it is not shared
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+    
+    async def acquire(self, route: str) -> None:
+        if self.semaphore.locked():
+            if self.waiting >= self.max_queue:
+                admission_decisions.inc(route=route, decision="shed")
+                raise HTTPException(status_code=503, detail="Server busy, please retry shortly",
+                                    headers={"Retry-After": "1"})
+            self.waiting += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                admission_decisions.inc(route=route, decision="shed")
+                raise HTTPException(status_code=503, detail="Server busy, please retry shortly",
+                                    headers={"Retry-After": "1"})
+            finally:
+                self.waiting -= 1
+                admission_queue_wait.observe(time.perf_counter() - started, route=route)
+            admission_decisions.inc(route=route, decision="queued")
+        else:
+            await self.semaphore.acquire()
+        self.active += 1
+    
+    def release(self) -> None:
+        self.active -= 1
+        self.semaphore.release()
+
+concurrency_limiters = {
+    route: ConcurrencyLimiter(limit, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_SECONDS)
+    for route, limit in CONCURRENCY_LIMITS.items() if limit > 0
+}
+
+class AdmissionGauges:
+    def render(self) -> List[str]:
+        lines = []
+        for name, field, help_text in (("admission_active", "active", "Requests holding a concurrency slot"),
+                                       ("admission_waiting", "waiting", "Requests queued for a concurrency slot")):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for route, limiter in sorted(concurrency_limiters.items()):
+                lines.append(f"{name}{format_labels([('route', route)])} {getattr(limiter, field)}")
+        return lines
+
+METRICS += [admission_decisions, admission_queue_wait, AdmissionGauges()]
+
+def client_identity(request: Request, by: str) -> str:
+    if by == "user":
+        # Read the user straight from the JWT so rejected requests never reach the database
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        if scheme.lower() == "bearer" and token:
+            try:
+                return "user:" + jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])['user_id']
+            except (jwt.InvalidTokenError, KeyError):
+                pass
+    return "ip:" + client_ip(request)
+
+def client_ip(request: Request) -> str:
+    # Each trusted proxy appends the address it saw, so the client is TRUSTED_PROXY_HOPS
+    # entries from the right; anything further left is client-supplied and spoofable
+    if TRUSTED_PROXY_HOPS:
+        hops = [hop.strip() for hop in ",".join(request.headers.getlist('x-forwarded-for')).split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+async def check_rate_limit(request: Request, route: str, by: str) -> None:
+    capacity, rate = RATE_LIMITS[route]
+    try:
+        retry_after = await rate_limit_store.take(f"{route}:{client_identity(request, by)}", capacity, rate)
+    except PyMongoError as e:
+        # Fail open: an unavailable shared store should not take the routes down with it
+        logger.warning(f"Rate limit store unavailable: {e}")
+        admission_decisions.inc(route=route, decision="error")
+        return
+    if retry_after:
+        admission_decisions.inc(route=route, decision="limited")
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    admission_decisions.inc(route=route, decision="allowed")
+
+def admit(route: str, by: str = "ip", when_param: Optional[str] = None):
+    # by="user" keys on the JWT subject (falling back to IP); when_param limits only requests carrying it
+    async def dependency(request: Request):
+        if not RATE_LIMIT_ENABLED or (when_param and not request.query_params.get(when_param)):
+            yield
+            return
+        if route in RATE_LIMITS:
+            await check_rate_limit(request, route, by)
+        limiter = concurrency_limiters.get(route)
+        if not limiter:
+            yield
+            return
+        await limiter.acquire(route)
+        try:
+            yield
+        finally:
+            limiter.release()
+    return dependency
+
 # Auth Routes
-@api_router.post("/auth/register")
+@api_router.post("/auth/register", response_model=AuthResponse, dependencies=[Depends(admit("register"))])
 async def register(user_data: UserCreate):
     existing = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password(user_data.password)
     user_dict = user_data.model_dump()
     user_dict.pop('password')
+    await externalize_images(user_dict, IMAGE_FIELDS['users'])
     
     user = User(**user_dict)
     doc = user.model_dump()
@@ -265,90 +2779,154 @@ async def register(user_data: UserCreate):
     token = create_token(user.id, user.role)
     return {"token": token, "user": UserResponse(**user.model_dump())}
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", response_model=AuthResponse, dependencies=[Depends(admit("login"))])
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user['password_hash']):
+    if not user or not await verify_password(credentials.password, user['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if password_needs_rehash(user['password_hash']):
+        try:
+            new_hash = await hash_password(credentials.password)
+            await db.users.update_one({"id": user['id']}, {"$set": {"password_hash": new_hash}})
+        except HTTPException:
+            # Pool saturated; the upgrade will happen on a later login
+            pass
+    
     token = create_token(user['id'], user['role'])
     user.pop('password_hash', None)
     return {"token": token, "user": user}
 
-@api_router.get("/auth/me")
+@api_router.get("/auth/me", response_model=UserResponse)
 async def get_me(current_user: Dict = Depends(get_current_user)):
     current_user.pop('password_hash', None)
     return current_user
 
 # Public Orphanage Routes
-@api_router.get("/orphanages")
-async def get_orphanages(city: Optional[str] = None, state: Optional[str] = None, 
+@api_router.get("/orphanages", response_model=List[OrphanageListing], response_model_exclude_unset=True,
+                dependencies=[Depends(admit("search", when_param="search"))])
+async def get_orphanages(request: Request, response: Response, city: Optional[str] = None, state: Optional[str] = None, 
                          type: Optional[OrphanageType] = None, 
-                         verified: Optional[bool] = None, search: Optional[str] = None):
-    query = {}
-    if city:
-        query['city'] = city
-    if state:
-        query['state'] = state
-    if type:
-        query['type'] = type
-    if verified is not None:
-        query['verification_status'] = VerificationStatus.VERIFIED if verified else VerificationStatus.PENDING
-    if search:
-        query['$or'] = [
-            {'name': {'$regex': search, '$options': 'i'}},
-            {'city': {'$regex': search, '$options': 'i'}},
-            {'state': {'$regex': search, '$options': 'i'}}
-        ]
+                         verified: Optional[bool] = None, search: Optional[str] = None,
+                         limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None,
+                         view: OrphanageView = OrphanageView.FULL, fields: Optional[str] = None,
+                         near_lat: Optional[float] = Query(None, ge=-90, le=90),
+                         near_lng: Optional[float] = Query(None, ge=-180, le=180),
+                         radius_km: Optional[float] = Query(None, gt=0, le=MAX_NEAR_RADIUS_KM)):
+    projection = orphanage_projection(view, fields)
+    near = near_lat is not None and near_lng is not None
+    if (near_lat is None) != (near_lng is None) or (radius_km and not near):
+        raise HTTPException(status_code=400, detail="near_lat and near_lng are required together, and radius_km needs both")
     
-    orphanages = await db.orphanages.find(query, {"_id": 0}).to_list(100)
-    return orphanages
+    async def load(response: Response):
+        query = {}
+        if city:
+            query['city'] = city
+        if state:
+            query['state'] = state
+        if type:
+            query['type'] = type
+        if verified is not None:
+            query['verification_status'] = VerificationStatus.VERIFIED if verified else VerificationStatus.PENDING
+        if search:
+            # Relevance-ranked top results among the filtered orphanages; the keyset cursor does not apply here
+            ranked_ids = (await get_search_index()).search(search, filters=dict(query))
+            if not ranked_ids:
+                return []
+            query['id'] = {'$in': ranked_ids}
+        if near:
+            orphanages = await find_near(query, projection, near_lat, near_lng, radius_km, limit, after, response)
+        elif search:
+            orphanages = await read_db.orphanages.find(query, projection).to_list(len(ranked_ids))
+            rank = {orphanage_id: i for i, orphanage_id in enumerate(ranked_ids)}
+            orphanages = sorted(orphanages, key=lambda o: rank[o['id']])[:limit]
+        else:
+            orphanages = await fetch_page(read_db.orphanages, query, limit, after, response, projection)
+        return card_view(orphanages) if view == OrphanageView.CARD and not fields else orphanages
+    
+    if near:
+        # Visitor coordinates hardly ever repeat, so caching these would only churn the cache
+        return await load(response)
+    return await cached_response(request, ["orphanages"], load, List[OrphanageListing], exclude_unset=True)
 
-@api_router.get("/orphanages/{slug}")
-async def get_orphanage_by_slug(slug: str):
-    orphanage = await db.orphanages.find_one({"slug": slug}, {"_id": 0})
-    if not orphanage:
-        raise HTTPException(status_code=404, detail="Orphanage not found")
-    return orphanage
+@api_router.get("/orphanages/{slug}", response_model=Orphanage)
+async def get_orphanage_by_slug(slug: str, request: Request):
+    async def load(response: Response):
+        orphanage = await read_db.orphanages.find_one({"slug": slug}, ORPHANAGE_FULL_PROJECTION)
+        if not orphanage:
+            raise HTTPException(status_code=404, detail="Orphanage not found")
+        return orphanage
+    
+    return await cached_response(request, ["orphanages"], load, Orphanage)
 
-# Donation Routes
-@api_router.post("/donations/create")
-async def create_donation(donation_data: DonationCreate, current_user: Dict = Depends(get_current_user)):
-    orphanage = await db.orphanages.find_one({"id": donation_data.orphanage_id}, {"_id": 0})
-    if not orphanage:
-        raise HTTPException(status_code=404, detail="Orphanage not found")
+@api_router.get("/funding-gaps", response_model=List[FundingGap])
+async def get_funding_gaps(request: Request, city: Optional[str] = None, category: Optional[DonationCategory] = None,
+                           limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None):
+    async def load(response: Response):
+        query = {"category": category.value if category else FUNDING_GAP_TOTAL, "remaining": {"$gt": 0}}
+        if city:
+            query['city'] = city
+        if after:
+            remaining, gap_id = decode_cursor(after, (float, str))
+            query['$or'] = [{"remaining": {"$lt": remaining}}, {"remaining": remaining, "id": {"$gt": gap_id}}]
+        gaps = await read_db.funding_gaps.find(query, {"_id": 0}).sort(FUNDING_GAP_SORT).limit(limit + 1).to_list(limit + 1)
+        if len(gaps) > limit:
+            gaps = gaps[:limit]
+            response.headers['X-Next-Cursor'] = encode_cursor(gaps[-1], ("remaining", "id"))
+        return [funding_gap_view(gap) for gap in gaps]
     
+    return await cached_response(request, ["funding_gaps"], load, List[FundingGap])
+
+# Donation Routes
+@api_router.post("/donations/create", response_model=Donation)
+async def create_donation(donation_data: DonationCreate, current_user: Dict = Depends(get_current_user),
+                          idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)):
     donation = Donation(
         donor_id=current_user['id'],
+        gateway_reference=f"MOCK_{uuid.uuid4()}",
         **donation_data.model_dump()
     )
     
-    doc = donation.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['gateway_reference'] = f"MOCK_{uuid.uuid4()}"
+    doc = to_document(donation)
+    if idempotency_key:
+        doc['idempotency_key'] = idempotency_key
     
-    await db.donations.insert_one(doc)
+    if DONATION_WRITE_MODE == "queued":
+        try:
+            accepted = await enqueue_donation(doc)
+        except OrphanageMissing:
+            raise HTTPException(status_code=404, detail="Orphanage not found")
+        accepted.pop('idempotency_key', None)
+        return Donation(**accepted)
     
-    # Update orphanage stats
-    await db.orphanages.update_one(
-        {"id": donation_data.orphanage_id},
-        {"$inc": {"total_donations": donation_data.amount}}
-    )
+    try:
+        await write_donation(doc)
+    except DuplicateKeyError:
+        # A retry of a donation we already recorded: hand back the original
+        existing = await db.donations.find_one(
+            {"donor_id": current_user['id'], "idempotency_key": idempotency_key},
+            {"_id": 0, "idempotency_key": 0}
+        )
+        if not idempotency_key or not existing:
+            raise
+        return Donation(**existing)
+    except OrphanageMissing:
+        raise HTTPException(status_code=404, detail="Orphanage not found")
+    
+    response_cache.invalidate("orphanages")
+    await apply_donation_rollups([doc])
+    await apply_donation_funding_gaps([doc])
+    await publish_donation_events([doc])
     
     return donation
 
-@api_router.get("/donations/my")
-async def get_my_donations(current_user: Dict = Depends(get_current_user)):
-    donations = await db.donations.find({"donor_id": current_user['id']}, {"_id": 0}).to_list(1000)
-    
-    for donation in donations:
-        orphanage = await db.orphanages.find_one({"id": donation['orphanage_id']}, {"_id": 0, "name": 1, "logo": 1})
-        donation['orphanage_name'] = orphanage.get('name', 'Unknown') if orphanage else 'Unknown'
-        donation['orphanage_logo'] = orphanage.get('logo') if orphanage else None
-    
-    return donations
+@api_router.get("/donations/my", response_model=List[DonationWithOrphanage])
+async def get_my_donations(response: Response, limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           after: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+    donations = await fetch_page(db.donations, {"donor_id": current_user['id']}, limit, after, response)
+    return await attach_orphanage_summaries(donations)
 
-@api_router.get("/donations/{donation_id}/receipt")
+@api_router.get("/donations/{donation_id}/receipt", response_model=DonationReceipt)
 async def get_donation_receipt(donation_id: str, current_user: Dict = Depends(get_current_user)):
     donation = await db.donations.find_one({"id": donation_id}, {"_id": 0})
     if not donation:
@@ -357,16 +2935,21 @@ async def get_donation_receipt(donation_id: str, current_user: Dict = Depends(ge
     if donation['donor_id'] != current_user['id'] and current_user['role'] not in [UserRole.SUPER_ADMIN]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    orphanage = await db.orphanages.find_one({"id": donation['orphanage_id']}, {"_id": 0})
+    orphanages = await find_by_ids(db.orphanages, [donation['orphanage_id']], ORPHANAGE_RECEIPT_FIELDS)
+    if donation['donor_id'] == current_user['id']:
+        donor = current_user
+    else:
+        donors = await find_by_ids(db.users, [donation['donor_id']], DONOR_SUMMARY_FIELDS)
+        donor = donors.get(donation['donor_id'], {})
     
     return {
         "donation": donation,
-        "donor": {"name": current_user['name'], "email": current_user['email']},
-        "orphanage": orphanage
+        "donor": {"name": donor.get('name'), "email": donor.get('email')},
+        "orphanage": orphanages.get(donation['orphanage_id'])
     }
 
 # Orphanage Admin Routes
-@api_router.post("/orphanages")
+@api_router.post("/orphanages", response_model=Orphanage)
 async def create_orphanage(orphanage_data: OrphanageCreate, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] not in [UserRole.SUPER_ADMIN, UserRole.ORPHANAGE_ADMIN]:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -376,52 +2959,89 @@ async def create_orphanage(orphanage_data: OrphanageCreate, current_user: Dict =
     if existing:
         slug = f"{slug}-{str(uuid.uuid4())[:8]}"
     
-    orphanage = Orphanage(slug=slug, **orphanage_data.model_dump())
+    orphanage_dict = await externalize_images(orphanage_data.model_dump(), IMAGE_FIELDS['orphanages'], current_user['id'])
+    orphanage_dict.update(location_fields(orphanage_dict['latitude'], orphanage_dict['longitude'],
+                                          orphanage_dict['city'], orphanage_dict['state']))
+    location = orphanage_dict.pop('location', None)
+    orphanage = Orphanage(slug=slug, **orphanage_dict)
     doc = orphanage.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
+    if location:
+        doc['location'] = location
     
     await db.orphanages.insert_one(doc)
     
     # Update user with orphanage_id if they're an orphanage admin
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN:
         await db.users.update_one({"id": current_user['id']}, {"$set": {"orphanage_id": orphanage.id}})
+        user_cache.delete(current_user['id'])
     
+    search_index.upsert(doc)
+    response_cache.invalidate("orphanages")
     return orphanage
 
-@api_router.put("/orphanages/{orphanage_id}")
+@api_router.put("/orphanages/{orphanage_id}", response_model=Orphanage)
 async def update_orphanage(orphanage_id: str, updates: Dict[str, Any], current_user: Dict = Depends(get_current_user)):
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
         raise HTTPException(status_code=403, detail="Access denied")
     if current_user['role'] == UserRole.DONOR:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    await db.orphanages.update_one({"id": orphanage_id}, {"$set": updates})
-    orphanage = await db.orphanages.find_one({"id": orphanage_id}, {"_id": 0})
+    updates.pop('location', None)
+    updates.pop('location_source', None)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No updates provided")
+    await externalize_images(updates, IMAGE_FIELDS['orphanages'], current_user['id'])
+    if 'latitude' in updates or 'longitude' in updates:
+        updates.update(location_fields(*parse_coordinates(updates.get('latitude'), updates.get('longitude')), None, None))
+    
+    orphanage = await db.orphanages.find_one_and_update(
+        {"id": orphanage_id}, {"$set": updates},
+        projection=ORPHANAGE_FULL_PROJECTION, return_document=ReturnDocument.AFTER
+    )
+    if not orphanage:
+        raise HTTPException(status_code=404, detail="Orphanage not found")
+    if ('city' in updates or 'state' in updates) and orphanage.get('location_source') != "provided":
+        # A move keeps the centroid in step unless the admin has pinned exact coordinates
+        fields = location_fields(None, None, orphanage.get('city'), orphanage.get('state'))
+        change = {"$set": fields} if fields else {"$unset": {"latitude": "", "longitude": "", "location": "", "location_source": ""}}
+        await db.orphanages.update_one({"id": orphanage_id}, change)
+        orphanage = {k: v for k, v in orphanage.items() if k not in ("latitude", "longitude", "location_source")}
+        orphanage.update({k: v for k, v in fields.items() if k != "location"})
+    search_index.upsert(orphanage)
+    response_cache.invalidate("orphanages")
+    await refresh_funding_gaps([orphanage_id])
     return orphanage
 
-@api_router.get("/orphanages/{orphanage_id}/children")
-async def get_children(orphanage_id: str):
-    children = await db.children.find({"orphanage_id": orphanage_id}, {"_id": 0}).to_list(1000)
-    return children
+@api_router.get("/orphanages/{orphanage_id}/children", response_model=List[Child])
+async def get_children(orphanage_id: str, request: Request,
+                       limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None):
+    async def load(response: Response):
+        return await fetch_page(read_db.children, {"orphanage_id": orphanage_id}, limit, after, response)
+    
+    return await cached_response(request, [f"children:{orphanage_id}"], load, List[Child])
 
-@api_router.post("/orphanages/{orphanage_id}/children")
+@api_router.post("/orphanages/{orphanage_id}/children", response_model=Child)
 async def add_child(orphanage_id: str, child_data: ChildCreate, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
         raise HTTPException(status_code=403, detail="Access denied")
     if current_user['role'] == UserRole.DONOR:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    child = Child(orphanage_id=orphanage_id, **child_data.model_dump())
+    child_dict = await externalize_images(child_data.model_dump(), IMAGE_FIELDS['children'], current_user['id'])
+    child = Child(orphanage_id=orphanage_id, **child_dict)
     doc = child.model_dump()
     doc['admission_date'] = doc['admission_date'].isoformat()
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.children.insert_one(doc)
     await db.orphanages.update_one({"id": orphanage_id}, {"$inc": {"total_children": 1}})
+    response_cache.invalidate(f"children:{orphanage_id}", "orphanages")
+    await refresh_funding_gaps([orphanage_id])
     
     return child
 
-@api_router.delete("/orphanages/{orphanage_id}/children/{child_id}")
+@api_router.delete("/orphanages/{orphanage_id}/children/{child_id}", response_model=SuccessResponse)
 async def delete_child(orphanage_id: str, child_id: str, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -431,14 +3051,45 @@ async def delete_child(orphanage_id: str, child_id: str, current_user: Dict = De
     result = await db.children.delete_one({"id": child_id, "orphanage_id": orphanage_id})
     if result.deleted_count:
         await db.orphanages.update_one({"id": orphanage_id}, {"$inc": {"total_children": -1}})
+        response_cache.invalidate(f"children:{orphanage_id}", "orphanages")
+        await refresh_funding_gaps([orphanage_id])
     return {"success": result.deleted_count > 0}
 
-@api_router.get("/orphanages/{orphanage_id}/staff")
-async def get_staff(orphanage_id: str):
-    staff = await db.staff.find({"orphanage_id": orphanage_id}, {"_id": 0}).to_list(1000)
-    return staff
+async def import_children(orphanage_id: str, rows: Iterable[Dict[str, Any]], uploaded_by: str) -> Dict[str, Any]:
+    result = await bulk_insert(db.children, orphanage_id, rows, ChildCreate, Child, uploaded_by)
+    if result['inserted']:
+        await db.orphanages.update_one({"id": orphanage_id}, {"$inc": {"total_children": result['inserted']}})
+        response_cache.invalidate(f"children:{orphanage_id}", "orphanages")
+        await refresh_funding_gaps([orphanage_id])
+    return result
+
+@api_router.post("/orphanages/{orphanage_id}/children/bulk", response_model=BulkImportResult)
+async def bulk_add_children(orphanage_id: str, rows: List[Dict[str, Any]], current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if current_user['role'] == UserRole.DONOR:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await import_children(orphanage_id, rows, current_user['id'])
+
+@api_router.post("/orphanages/{orphanage_id}/children/import", response_model=BulkImportResult)
+async def import_children_csv(orphanage_id: str, file: UploadFile = File(...), current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if current_user['role'] == UserRole.DONOR:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await import_children(orphanage_id, csv_rows(file), current_user['id'])
 
-@api_router.post("/orphanages/{orphanage_id}/staff")
+@api_router.get("/orphanages/{orphanage_id}/staff", response_model=List[Staff])
+async def get_staff(orphanage_id: str, request: Request,
+                    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None):
+    async def load(response: Response):
+        return await fetch_page(read_db.staff, {"orphanage_id": orphanage_id}, limit, after, response)
+    
+    return await cached_response(request, [f"staff:{orphanage_id}"], load, List[Staff])
+
+@api_router.post("/orphanages/{orphanage_id}/staff", response_model=Staff)
 async def add_staff(orphanage_id: str, staff_data: StaffCreate, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -450,115 +3101,351 @@ async def add_staff(orphanage_id: str, staff_data: StaffCreate, current_user: Di
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.staff.insert_one(doc)
+    response_cache.invalidate(f"staff:{orphanage_id}")
     return staff
 
-@api_router.get("/orphanages/{orphanage_id}/donations")
-async def get_orphanage_donations(orphanage_id: str, current_user: Dict = Depends(get_current_user)):
+async def import_staff(orphanage_id: str, rows: Iterable[Dict[str, Any]], uploaded_by: str) -> Dict[str, Any]:
+    result = await bulk_insert(db.staff, orphanage_id, rows, StaffCreate, Staff, uploaded_by)
+    if result['inserted']:
+        response_cache.invalidate(f"staff:{orphanage_id}")
+    return result
+
+@api_router.post("/orphanages/{orphanage_id}/staff/bulk", response_model=BulkImportResult)
+async def bulk_add_staff(orphanage_id: str, rows: List[Dict[str, Any]], current_user: Dict = Depends(get_current_user)):
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
         raise HTTPException(status_code=403, detail="Access denied")
     if current_user['role'] == UserRole.DONOR:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    donations = await db.donations.find({"orphanage_id": orphanage_id}, {"_id": 0}).to_list(1000)
+    return await import_staff(orphanage_id, rows, current_user['id'])
+
+@api_router.post("/orphanages/{orphanage_id}/staff/import", response_model=BulkImportResult)
+async def import_staff_csv(orphanage_id: str, file: UploadFile = File(...), current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if current_user['role'] == UserRole.DONOR:
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    for donation in donations:
-        if not donation.get('is_anonymous'):
-            donor = await db.users.find_one({"id": donation['donor_id']}, {"_id": 0, "name": 1, "email": 1})
-            donation['donor_name'] = donor.get('name', 'Anonymous') if donor else 'Anonymous'
-        else:
-            donation['donor_name'] = 'Anonymous'
+    return await import_staff(orphanage_id, csv_rows(file), current_user['id'])
+
+@api_router.get("/orphanages/{orphanage_id}/donations", response_model=List[Donation])
+async def get_orphanage_donations(orphanage_id: str, response: Response,
+                                  limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                  after: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if current_user['role'] == UserRole.DONOR:
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    return donations
+    donations = await fetch_page(db.donations, {"orphanage_id": orphanage_id}, limit, after, response)
+    return await attach_donor_names(donations)
+
+# Media Routes
+async def serve_media(request: Request, digest: str, variant: Optional[str] = None) -> Response:
+    if not MEDIA_HASH_RE.match(digest) or (variant and variant not in MEDIA_VARIANTS):
+        raise HTTPException(status_code=404, detail="Media not found")
+    etag = f'"{digest}-{variant}"' if variant else f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    media = await get_media(digest)
+    if not media:
+        raise HTTPException(status_code=404, detail="Media not found")
+    content_type = media['variants'][variant]['content_type'] if variant else media['content_type']
+    response = await media_storage.response(media_key(digest, variant), content_type, headers)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return response
+
+@api_router.post("/media", response_model=MediaInfo)
+async def upload_media(file: UploadFile = File(...), current_user: Dict = Depends(get_current_user)):
+    data = await file.read(MEDIA_MAX_BYTES + 1)
+    return media_view(await store_media(data, current_user['id']))
+
+@api_router.get("/media/{digest}", response_class=Response)
+async def get_media_file(digest: str, request: Request):
+    return await serve_media(request, digest)
+
+@api_router.get("/media/{digest}/{variant}", response_class=Response)
+async def get_media_variant(digest: str, variant: str, request: Request):
+    return await serve_media(request, digest, variant)
 
 # Analytics Routes
-@api_router.get("/analytics/orphanage/{orphanage_id}")
+@api_router.get("/analytics/orphanage/{orphanage_id}", response_model=OrphanageAnalytics,
+                dependencies=[Depends(admit("analytics", "user"))])
 async def get_orphanage_analytics(orphanage_id: str, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] == UserRole.ORPHANAGE_ADMIN and current_user.get('orphanage_id') != orphanage_id:
         raise HTTPException(status_code=403, detail="Access denied")
     if current_user['role'] == UserRole.DONOR:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    orphanage = await db.orphanages.find_one({"id": orphanage_id}, {"_id": 0})
+    orphanage = await read_db.orphanages.find_one({"id": orphanage_id}, {"_id": 0, "id": 1, "total_donations": 1})
     if not orphanage:
         raise HTTPException(status_code=404, detail="Orphanage not found")
     
-    donations = await db.donations.find({"orphanage_id": orphanage_id}, {"_id": 0}).to_list(10000)
-    
-    # Calculate category-wise totals
-    category_totals = {}
-    for donation in donations:
-        for category, amount in donation.get('breakdown', {}).items():
-            category_totals[category] = category_totals.get(category, 0) + amount
-    
-    # Monthly donations
-    now = datetime.now(timezone.utc)
-    this_month = [d for d in donations if datetime.fromisoformat(d['created_at']).month == now.month]
-    this_year = [d for d in donations if datetime.fromisoformat(d['created_at']).year == now.year]
+    stats = (await rollup_stats(orphanage_rollup_id(orphanage_id))
+             or await aggregate_donation_stats({"orphanage_id": orphanage_id}))
+    recent = await read_db.donations.find({"orphanage_id": orphanage_id}, {"_id": 0}).sort("created_at", -1).to_list(10)
     
     return {
         "total_donations": orphanage.get('total_donations', 0),
-        "this_month": sum(d['amount'] for d in this_month),
-        "this_year": sum(d['amount'] for d in this_year),
-        "category_totals": category_totals,
-        "total_donors": len(set(d['donor_id'] for d in donations)),
-        "recent_donations": donations[-10:] if donations else []
+        "this_month": stats['this_month'],
+        "this_year": stats['this_year'],
+        "category_totals": stats['category_totals'],
+        "total_donors": stats['total_donors'],
+        "recent_donations": recent[::-1]
     }
 
+@api_router.post("/events/ticket", response_model=StreamTicket)
+async def create_events_ticket(current_user: Dict = Depends(get_current_user)):
+    return {"ticket": create_stream_ticket(current_user['id'], current_user['role']),
+            "expires_in": EVENTS_TICKET_SECONDS}
+
+@api_router.get("/events/stream", response_class=StreamingResponse)
+async def stream_events(orphanage_id: Optional[str] = None, current_user: Dict = Depends(get_stream_user)):
+    if current_user['role'] == UserRole.ORPHANAGE_ADMIN:
+        if not current_user.get('orphanage_id') or orphanage_id not in (None, current_user['orphanage_id']):
+            raise HTTPException(status_code=403, detail="Access denied")
+        orphanage_id = current_user['orphanage_id']
+    elif current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    async def stream():
+        # Subscribe before reading the snapshot so nothing falls between the two
+        queue = live_events.subscribe(orphanage_id)
+        try:
+            rollup_id = orphanage_rollup_id(orphanage_id) if orphanage_id else PLATFORM_ROLLUP_ID
+            snapshot = await db.analytics_rollups.find_one({"id": rollup_id}, LIVE_ROLLUP_FIELDS)
+            if snapshot:
+                yield sse_message("totals", rollup_event(snapshot))
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), LIVE_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield sse_message(message['event'], message['data'])
+                if message is LAGGED:
+                    return
+        finally:
+            live_events.unsubscribe(queue)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Super Admin Routes
-@api_router.get("/admin/orphanages")
-async def admin_get_all_orphanages(current_user: Dict = Depends(get_current_user)):
+@api_router.get("/admin/orphanages", response_model=List[OrphanageListing], response_model_exclude_unset=True)
+async def admin_get_all_orphanages(response: Response, limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                   after: Optional[str] = None, format: Optional[str] = Query(None, pattern="^ndjson$"),
+                                   view: OrphanageView = OrphanageView.FULL, fields: Optional[str] = None,
+                                   current_user: Dict = Depends(get_current_user)):
     if current_user['role'] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    orphanages = await db.orphanages.find({}, {"_id": 0}).to_list(1000)
-    return orphanages
+    projection = orphanage_projection(view, fields)
+    if format == "ndjson":
+        return ndjson_export(db.orphanages, {}, after, projection)
+    orphanages = await fetch_page(db.orphanages, {}, limit, after, response, projection)
+    return card_view(orphanages) if view == OrphanageView.CARD and not fields else orphanages
 
-@api_router.put("/admin/orphanages/{orphanage_id}/verify")
-async def verify_orphanage(orphanage_id: str, status: VerificationStatus, current_user: Dict = Depends(get_current_user)):
+@api_router.put("/admin/orphanages/{orphanage_id}/verify", response_model=VerificationResult)
+async def verify_orphanage(orphanage_id: str, verification: VerificationStatus = Query(..., alias="status"),
+                           current_user: Dict = Depends(get_current_user)):
     if current_user['role'] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    await db.orphanages.update_one({"id": orphanage_id}, {"$set": {"verification_status": status}})
-    return {"success": True}
+    orphanage = await db.orphanages.find_one_and_update(
+        {"id": orphanage_id}, {"$set": {"verification_status": verification}},
+        projection=ORPHANAGE_FULL_PROJECTION, return_document=ReturnDocument.AFTER
+    )
+    if not orphanage:
+        raise HTTPException(status_code=404, detail="Orphanage not found")
+    search_index.upsert(orphanage)
+    response_cache.invalidate("orphanages")
+    await refresh_funding_gaps([orphanage_id])
+    return {"success": True, "orphanage": orphanage}
 
-@api_router.get("/admin/donations")
-async def admin_get_all_donations(current_user: Dict = Depends(get_current_user)):
+@api_router.get("/admin/donations", response_model=List[Donation])
+async def admin_get_all_donations(response: Response, limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                  after: Optional[str] = None, format: Optional[str] = Query(None, pattern="^ndjson$"),
+                                  current_user: Dict = Depends(get_current_user)):
     if current_user['role'] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    donations = await db.donations.find({}, {"_id": 0}).to_list(10000)
-    return donations
+    if format == "ndjson":
+        return ndjson_export(db.donations, {}, after)
+    return await fetch_page(db.donations, {}, limit, after, response)
 
-@api_router.get("/analytics/platform")
-async def get_platform_analytics(current_user: Dict = Depends(get_current_user)):
+@api_router.post("/admin/analytics/rebuild", response_model=Dict[str, int])
+async def rebuild_analytics(current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await rebuild_analytics_rollups()
+
+@api_router.post("/admin/funding-gaps/refresh", response_model=Dict[str, int])
+async def refresh_funding_gap_feed(current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await refresh_funding_gaps()
+
+@api_router.get("/admin/indexes", response_model=Dict[str, Any])
+async def get_index_status(current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await index_status()
+
+@api_router.post("/admin/reports", response_model=ReportJob, dependencies=[Depends(admit("reports", "user"))])
+async def create_report(report: ReportRequest, current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if report.format == ReportFormat.PARQUET and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+    
+    job = ReportJob(requested_by=current_user['id'], **report.model_dump())
+    doc = to_document(job)
+    await db.report_jobs.insert_one(doc)
+    doc.pop('_id', None)
+    report_tasks[job.id] = asyncio.create_task(run_report_job(doc))
+    return job
+
+@api_router.get("/admin/reports", response_model=List[ReportJob])
+async def list_reports(current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    jobs = await db.report_jobs.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    return [report_view(job) for job in jobs]
+
+@api_router.get("/admin/reports/{job_id}", response_model=ReportJob)
+async def get_report(job_id: str, current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    job = await db.report_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_view(job)
+
+@api_router.get("/admin/reports/{job_id}/download", response_class=FileResponse)
+async def download_report(job_id: str, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    total_orphanages = await db.orphanages.count_documents({})
-    verified = await db.orphanages.count_documents({"verification_status": VerificationStatus.VERIFIED})
-    pending = await db.orphanages.count_documents({"verification_status": VerificationStatus.PENDING})
+    job = await db.report_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if job['status'] != ReportStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Report is {job['status'].lower()}")
+    
+    path = report_path(job)
+    if not path.exists():
+        # Files live on the worker that built them; another worker, or a cleaned-up
+        # REPORTS_DIR, has nothing to serve, so the report has to be requested again
+        raise HTTPException(status_code=410, detail="Report file is no longer available, please request it again")
+    media_type = "text/csv" if job['format'] == ReportFormat.CSV else "application/vnd.apache.parquet"
+    filename = f"{job['kind'].lower()}{'-' + str(job['year']) if job.get('year') else ''}.{job['format'].lower()}"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+async def require_metrics_access(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> None:
+    if not credentials:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    if METRICS_TOKEN and hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        return
+    current_user = await user_from_token(credentials.credentials)
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+@api_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+@api_router.get("/health/ready", response_model=ReadinessReport)
+async def readiness(response: Response):
+    # Not ready when Mongo is unreachable or a pool is exhausted with callers queued,
+    # so the load balancer shifts traffic to other workers
+    report = {"ready": True, "mongo": True, "password_hashing_pending": password_executor.pending}
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_SECONDS)
+        report['mongo_latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    except (PyMongoError, asyncio.TimeoutError) as e:
+        report.update(ready=False, mongo=False, error=str(e) or "Ping timed out")
+    
+    pools = {}
+    for address, pool in mongo_pool.snapshot().items():
+        pools[address] = {**pool, "saturation": round(pool['checked_out'] / MONGO_MAX_POOL_SIZE, 3)}
+        if pool['waiting'] and pool['checked_out'] >= MONGO_MAX_POOL_SIZE:
+            report['ready'] = False
+    report['pools'] = pools
+    if not report['ready']:
+        response.status_code = 503
+    return report
+
+@api_router.get("/analytics/platform", response_model=PlatformAnalytics,
+                dependencies=[Depends(admit("analytics", "user"))])
+async def get_platform_analytics(current_user: Dict = Depends(get_current_user)):
+    if current_user['role'] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    donations = await db.donations.find({}, {"_id": 0}).to_list(100000)
-    total_donations = sum(d['amount'] for d in donations)
+    status_counts = await read_db.orphanages.aggregate([
+        {"$group": {"_id": "$verification_status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    counts = {row['_id']: row['count'] for row in status_counts}
+    stats = await rollup_stats(PLATFORM_ROLLUP_ID) or await aggregate_donation_stats({})
     
     return {
-        "total_orphanages": total_orphanages,
-        "verified_orphanages": verified,
-        "pending_orphanages": pending,
-        "total_donations": total_donations,
-        "total_donors": len(set(d['donor_id'] for d in donations)),
-        "total_transactions": len(donations)
+        "total_orphanages": sum(counts.values()),
+        "verified_orphanages": counts.get(VerificationStatus.VERIFIED, 0),
+        "pending_orphanages": counts.get(VerificationStatus.PENDING, 0),
+        "total_donations": stats['total_amount'],
+        "total_donors": stats['total_donors'],
+        "total_transactions": stats['total_transactions']
     }
 
 # Include router
 app.include_router(api_router)
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_stats.reset(token)
+    elapsed = time.perf_counter() - started
+    
+    route = request.scope.get('route')
+    route_path = route.path if route else "unmatched"
+    http_requests_total.inc(method=request.method, route=route_path, status=response.status_code)
+    http_request_duration.observe(elapsed, method=request.method, route=route_path)
+    mongo_round_trips.observe(stats.mongo_calls, route=route_path)
+    mongo_documents.observe(stats.mongo_docs, route=route_path)
+    
+    timings = [
+        f"app;dur={elapsed * 1000:.1f}",
+        f'db;dur={stats.mongo_seconds * 1000:.1f};desc="{stats.mongo_calls} queries, {stats.mongo_docs} docs"'
+    ]
+    if stats.bcrypt_seconds:
+        timings.append(f"bcrypt;dur={stats.bcrypt_seconds * 1000:.1f}")
+    response.headers['Server-Timing'] = ", ".join(timings)
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "Retry-After"],
 )
 
 logging.basicConfig(
@@ -567,6 +3454,80 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def warm_up_mongo():
+    # Concurrent pings open MONGO_WARMUP_CONNECTIONS sockets before the first request needs them
+    try:
+        await asyncio.gather(*(db.command("ping") for _ in range(MONGO_WARMUP_CONNECTIONS)))
+        if MONGO_SECONDARY_READS:
+            await asyncio.gather(*(read_db.command("ping", read_preference=read_db.read_preference)
+                                   for _ in range(MONGO_WARMUP_CONNECTIONS)))
+    except PyMongoError as e:
+        logger.warning(f"Mongo warm-up failed: {e}")
+
+@app.on_event("startup")
+async def bootstrap_indexes():
+    if not ENSURE_INDEXES_ON_STARTUP:
+        return
+    report = await index_status()
+    missing = {c: info['missing'] for c, info in report['collections'].items() if info['missing']}
+    if missing:
+        logger.info(f"Missing indexes: {missing}")
+    if report['building']:
+        logger.info(f"Index builds in progress: {report['building']}")
+    # Build in the background so a large collection does not hold up startup
+    app.state.index_bootstrap = asyncio.create_task(ensure_indexes())
+
+@app.on_event("startup")
+async def start_donation_queue():
+    # Also runs in sync mode when a log is left over, so nothing queued is lost
+    if DONATION_WRITE_MODE != "queued" and not DONATION_QUEUE_PATH.exists():
+        return
+    await asyncio.to_thread(donation_queue.open)
+    app.state.donation_queue = asyncio.create_task(run_donation_queue())
+
+@app.on_event("startup")
+async def backfill_rollups():
+    # First start after rollups shipped: count the donations that predate them, on one worker only
+    if not ROLLUP_BACKFILL_ON_STARTUP:
+        return
+    try:
+        if await rollups_built() or not await acquire_lease("rollup_backfill", 3600):
+            return
+    except PyMongoError as e:
+        logger.warning(f"Rollup backfill check failed: {e}")
+        return
+    app.state.rollup_backfill = asyncio.create_task(rebuild_analytics_rollups(repair_totals=False))
+
+@app.on_event("startup")
+async def start_funding_gap_refresh():
+    if FUNDING_GAP_REFRESH_SECONDS <= 0:
+        return
+    app.state.funding_gap_refresh = asyncio.create_task(run_funding_gap_refresh())
+
+@app.on_event("startup")
+async def start_live_events():
+    if LIVE_EVENTS_SOURCE != "change_stream":
+        return
+    app.state.live_events = asyncio.create_task(run_live_events())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    stream = getattr(app.state, 'live_events', None)
+    if stream:
+        stream.cancel()
+    refresh = getattr(app.state, 'funding_gap_refresh', None)
+    if refresh:
+        refresh.cancel()
+    task = getattr(app.state, 'donation_queue', None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if donation_queue.consumer_lock:
+            await flush_donation_queue()
+        donation_queue.close()
+    client.close()
+    password_executor.shutdown()
\ No newline at end of file
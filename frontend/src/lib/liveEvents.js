@@ -0,0 +1,42 @@
+import axios from 'axios';
+
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const RECONNECT_DELAY_MS = 3000;
+
+// EventSource cannot send the Authorization header, so each connection opens with a
+// short-lived ticket; a dropped stream reconnects with a fresh one instead of letting
+// the browser retry with the expired ticket.
+export function subscribeLiveEvents(path, handlers) {
+  let source = null;
+  let timer = null;
+  let closed = false;
+
+  const retry = () => {
+    if (!closed) timer = setTimeout(connect, RECONNECT_DELAY_MS);
+  };
+
+  const connect = async () => {
+    try {
+      const { data } = await axios.post(`${API}/events/ticket`);
+      if (closed) return;
+      const separator = path.includes('?') ? '&' : '?';
+      source = new EventSource(`${API}${path}${separator}ticket=${encodeURIComponent(data.ticket)}`);
+      Object.entries(handlers).forEach(([event, handler]) => {
+        source.addEventListener(event, (message) => handler(JSON.parse(message.data)));
+      });
+      source.onerror = () => {
+        source.close();
+        retry();
+      };
+    } catch (error) {
+      retry();
+    }
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+}
@@ -26,7 +26,7 @@ export default function LandingPage() {
   const fetchData = async () => {
     try {
       const [orphanagesRes] = await Promise.all([
-        axios.get(`${API}/orphanages?verified=true`),
+        axios.get(`${API}/orphanages?verified=true&view=card`),
       ]);
 
       const orphanages = orphanagesRes.data || [];
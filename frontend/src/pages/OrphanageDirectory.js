@@ -34,7 +34,7 @@ export default function OrphanageDirectory() {
 
   const fetchOrphanages = async () => {
     try {
-      const response = await axios.get(`${API}/orphanages`);
+      const response = await axios.get(`${API}/orphanages?view=card`);
       setOrphanages(response.data || []);
     } catch (error) {
       console.error('Failed to fetch orphanages:', error);
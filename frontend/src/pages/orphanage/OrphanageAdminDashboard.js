@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useAuth } from '../../contexts/AuthContext';
+import { subscribeLiveEvents } from '../../lib/liveEvents';
 import { useNavigate } from 'react-router-dom';
 import Navigation from '../../components/Navigation';
 import Footer from '../../components/Footer';
@@ -22,6 +23,20 @@ export default function OrphanageAdminDashboard() {
     }
   }, [user]);
 
+  useEffect(() => {
+    if (!user?.orphanage_id) return undefined;
+    return subscribeLiveEvents('/events/stream', {
+      totals: (totals) => setAnalytics((current) => current && {
+        ...current,
+        total_donations: totals.total_amount,
+        this_month: totals.this_month,
+        this_year: totals.this_year,
+        total_donors: totals.total_donors,
+        category_totals: totals.category_totals,
+      }),
+    });
+  }, [user]);
+
   const fetchAnalytics = async () => {
     try {
       const response = await axios.get(`${API}/analytics/orphanage/${user.orphanage_id}`);
@@ -21,7 +21,7 @@ export default function OrphanageVerification() {
 
   const fetchOrphanages = async () => {
     try {
-      const response = await axios.get(`${API}/admin/orphanages`);
+      const response = await axios.get(`${API}/admin/orphanages?fields=name,city,state,registration_number,verification_status`);
       setOrphanages(response.data || []);
     } catch (error) {
       console.error('Failed to fetch orphanages:', error);
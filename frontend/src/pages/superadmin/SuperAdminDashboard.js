@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
+import { subscribeLiveEvents } from '../../lib/liveEvents';
 import Navigation from '../../components/Navigation';
 import Footer from '../../components/Footer';
 import { Button } from '../../components/ui/button';
@@ -17,6 +18,20 @@ export default function SuperAdminDashboard() {
     fetchAnalytics();
   }, []);
 
+  useEffect(() => {
+    return subscribeLiveEvents('/events/stream', {
+      totals: (totals) => {
+        if (totals.orphanage_id) return;
+        setAnalytics((current) => current && {
+          ...current,
+          total_donations: totals.total_amount,
+          total_donors: totals.total_donors,
+          total_transactions: totals.total_transactions,
+        });
+      },
+    });
+  }, []);
+
   const fetchAnalytics = async () => {
     try {
       const response = await axios.get(`${API}/analytics/platform`);
@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+SCRATCH_DIR = Path(tempfile.mkdtemp(prefix="orphancare-tests-"))
+
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "orphancare_test")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("MEDIA_ROOT", str(SCRATCH_DIR / "media"))
+os.environ.setdefault("REPORTS_DIR", str(SCRATCH_DIR / "reports"))
+os.environ.setdefault("DONATION_QUEUE_PATH", str(SCRATCH_DIR / "donation_queue.db"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def use_database(monkeypatch, database) -> None:
+    # Point every module-level handle at a fresh database and drop per-process state
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "read_db", database)
+    monkeypatch.setattr(server, "user_cache", server.TTLCache(server.USER_CACHE_MAX_ENTRIES, server.USER_CACHE_TTL_SECONDS))
+    monkeypatch.setattr(server, "response_cache", server.ResponseCache(
+        server.TTLCache(server.RESPONSE_CACHE_MAX_ENTRIES, server.RESPONSE_CACHE_TTL_SECONDS)))
+    monkeypatch.setattr(server, "search_index", server.OrphanageSearchIndex())
+    monkeypatch.setattr(server, "search_index_refresh", None)
+    monkeypatch.setattr(server, "live_events", server.LiveEventHub(server.LIVE_EVENTS_QUEUE_SIZE))
+    monkeypatch.setattr(server, "rollups_ready", False)
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    import mongomock_motor
+    database = mongomock_motor.AsyncMongoMockClient()[f"test_{uuid.uuid4().hex[:8]}"]
+    use_database(monkeypatch, database)
+    return database
+
+
+@pytest.fixture
+async def client(mock_db):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as c:
+        yield c
+
+
+async def register(c: httpx.AsyncClient, email: str, role: str = "DONOR") -> dict:
+    response = await c.post("/api/auth/register", json={
+        "name": email.split("@")[0], "email": email, "password": "secret", "phone": "9000000000", "role": role
+    })
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+async def create_orphanage(c: httpx.AsyncClient, headers: dict, name: str = "Asha Home", city: str = "Pune",
+                           state: str = "Maharashtra", **fields) -> dict:
+    response = await c.post("/api/orphanages", headers=headers, json={
+        "name": name, "description": f"{name} cares for children in {city}", "registration_number": "REG/1",
+        "contact_person": "Warden", "email": "home@example.org", "phone": "9000000001",
+        "address": "1 Main Road", "city": city, "state": state, "type": "MIXED", **fields
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+async def accounts(client):
+    admin = await register(client, "admin@example.org", "SUPER_ADMIN")
+    donor = await register(client, "donor@example.org")
+    orphanage_admin = await register(client, "warden@example.org", "ORPHANAGE_ADMIN")
+    orphanage = await create_orphanage(client, orphanage_admin)
+    return {"admin": admin, "donor": donor, "orphanage_admin": orphanage_admin, "orphanage": orphanage}
@@ -0,0 +1,27 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(server, "rate_limit_store", server.MemoryRateLimitStore(server.RATE_LIMIT_MAX_KEYS))
+
+
+async def login_from(client, forwarded_for):
+    response = await client.post("/api/auth/login", headers={"X-Forwarded-For": forwarded_for},
+                                 json={"email": "donor@example.org", "password": "secret"})
+    return response.status_code
+
+
+async def test_login_limit_keys_on_the_trusted_forwarded_address(client, accounts, rate_limited):
+    capacity, _ = server.RATE_LIMITS['login']
+    assert [await login_from(client, "203.0.113.7") for _ in range(capacity)] == [200] * capacity
+    assert await login_from(client, "203.0.113.7") == 429
+    # Entries left of the trusted hop are client-supplied and must not buy a fresh bucket
+    assert await login_from(client, "198.51.100.1, 203.0.113.7") == 429
+    assert await login_from(client, "203.0.113.8") == 200
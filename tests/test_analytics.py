@@ -0,0 +1,52 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_partial_rollups_are_not_trusted_until_rebuilt(client, accounts, mock_db):
+    orphanage_id = accounts['orphanage']['id']
+    # History from before rollups existed: in donations, never $inc'd into a rollup
+    legacy = server.Donation(donor_id="legacy-donor", orphanage_id=orphanage_id, amount=400,
+                             breakdown={"EDUCATION": 300, "BOOKS": 100}, gateway_reference="MOCK")
+    await mock_db.donations.insert_one(server.to_document(legacy))
+    response = await client.post("/api/donations/create", headers=accounts['donor'],
+                                 json={"orphanage_id": orphanage_id, "amount": 100, "breakdown": {"MEALS": 100}})
+    assert response.status_code == 200, response.text
+
+    async def platform():
+        response = await client.get("/api/analytics/platform", headers=accounts['admin'])
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    async def categories():
+        response = await client.get(f"/api/analytics/orphanage/{orphanage_id}", headers=accounts['orphanage_admin'])
+        assert response.status_code == 200, response.text
+        return response.json()['category_totals']
+
+    before = await platform()
+    # Unknown breakdown keys fold into OTHER on the fallback too, as they do in the rollups
+    assert await categories() == {"MEALS": 100, "EDUCATION": 300, "OTHER": 100}
+    assert (before['total_donations'], before['total_transactions'], before['total_donors']) == (500, 2, 2)
+
+    await server.rebuild_analytics_rollups()
+    assert await mock_db.analytics_rollups.find_one({"id": server.ROLLUPS_BUILT_ID})
+    assert await platform() == before
+    assert await categories() == {"MEALS": 100, "EDUCATION": 300, "OTHER": 100}
+    assert server.rollups_ready
+
+
+async def test_startup_backfill_leaves_orphanage_totals_alone(client, accounts, mock_db):
+    orphanage_id = accounts['orphanage']['id']
+    response = await client.post("/api/donations/create", headers=accounts['donor'],
+                                 json={"orphanage_id": orphanage_id, "amount": 60, "breakdown": {"MEALS": 60}})
+    assert response.status_code == 200, response.text
+    # A donation landing mid-rebuild would make a recomputed total wrong; the live one is left as is
+    await mock_db.orphanages.update_one({"id": orphanage_id}, {"$set": {"total_donations": 75}})
+
+    await server.backfill_rollups()
+    await server.app.state.rollup_backfill
+
+    assert await server.rollups_built()
+    assert (await mock_db.orphanages.find_one({"id": orphanage_id}))['total_donations'] == 75
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+import bcrypt
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+# Production-grade cost: one verify takes long enough that running it on the
+# event loop would hold nearly every poll past MAX_STALL_SECONDS. The bound is on
+# the 95th percentile so a lone scheduler hiccup on a busy CI box does not fail it.
+LOGIN_ROUNDS = 13
+MAX_STALL_SECONDS = 0.2
+
+
+async def test_health_stays_responsive_during_concurrent_logins(client, accounts, mock_db, monkeypatch):
+    monkeypatch.setattr(server, "BCRYPT_ROUNDS", LOGIN_ROUNDS)
+    password_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=LOGIN_ROUNDS)).decode()
+    await mock_db.users.update_one({"email": "donor@example.org"}, {"$set": {"password_hash": password_hash}})
+
+    logins = [asyncio.ensure_future(client.post("/api/auth/login", json={"email": "donor@example.org",
+                                                                           "password": "secret"}))
+              for _ in range(server.BCRYPT_WORKERS * 2)]
+    latencies = []
+    while not all(login.done() for login in logins):
+        started = time.perf_counter()
+        response = await client.get("/api/health/ready")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+        await asyncio.sleep(0.01)
+
+    assert all(login.result().status_code == 200 for login in logins)
+    assert len(latencies) > 20, latencies
+    assert sorted(latencies)[int(len(latencies) * 0.95)] < MAX_STALL_SECONDS, latencies
@@ -0,0 +1,69 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    donation_queue = server.DonationQueue(tmp_path / "donation_queue.db")
+    donation_queue.open()
+    monkeypatch.setattr(server, "donation_queue", donation_queue)
+    yield donation_queue
+    donation_queue.close()
+
+
+def queued_donation(donor_id, orphanage_id, amount):
+    donation = server.Donation(donor_id=donor_id, orphanage_id=orphanage_id, amount=amount,
+                               breakdown={"MEALS": amount}, gateway_reference="MOCK")
+    return server.to_document(donation)
+
+
+async def test_replay_after_crash_counts_totals_once(accounts, mock_db, queue, monkeypatch):
+    orphanage_id = accounts['orphanage']['id']
+    for amount in (100, 250):
+        queue.append(queued_donation("donor", orphanage_id, amount))
+
+    def crash(seqs):
+        raise RuntimeError("worker died before clearing the log")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(queue, "remove", crash)
+        with pytest.raises(RuntimeError):
+            await server.flush_donation_queue()
+    assert {state for _, state, _ in queue.pending(10)} == {server.INSERTED}
+
+    await server.flush_donation_queue()
+
+    assert queue.pending(10) == []
+    assert await mock_db.donations.count_documents({}) == 2
+    orphanage = await mock_db.orphanages.find_one({"id": orphanage_id})
+    assert orphanage['total_donations'] == 350
+
+
+async def test_rebuild_rollups_repairs_orphanage_totals(accounts, client, mock_db):
+    orphanage_id = accounts['orphanage']['id']
+    response = await client.post("/api/donations/create", headers=accounts['donor'],
+                                 json={"orphanage_id": orphanage_id, "amount": 75, "breakdown": {"MEALS": 75}})
+    assert response.status_code == 200, response.text
+    await mock_db.orphanages.update_one({"id": orphanage_id}, {"$set": {"total_donations": 999}})
+
+    result = await server.rebuild_analytics_rollups()
+
+    assert result['orphanage_totals'] == 1
+    orphanage = await mock_db.orphanages.find_one({"id": orphanage_id})
+    assert orphanage['total_donations'] == 75
+
+
+async def test_replay_watermarks_stay_out_of_orphanage_responses(client, accounts, mock_db, queue):
+    orphanage = accounts['orphanage']
+    queue.append(queued_donation("donor", orphanage['id'], 100))
+    await server.flush_donation_queue()
+    assert (await mock_db.orphanages.find_one({"id": orphanage['id']}))['queue_applied']
+
+    listing = (await client.get("/api/orphanages")).json()
+    detail = (await client.get(f"/api/orphanages/{orphanage['slug']}")).json()
+    admin_listing = (await client.get("/api/admin/orphanages", headers=accounts['admin'])).json()
+    for body in (*listing, detail, *admin_listing):
+        assert "queue_applied" not in body
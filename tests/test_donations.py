@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from pymongo import ASCENDING
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_parallel_retries_record_each_key_once(client, accounts, mock_db):
+    # mongomock ignores partialFilterExpression, so enforce the same key uniqueness directly
+    await mock_db.donations.create_index([("donor_id", ASCENDING), ("idempotency_key", ASCENDING)], unique=True)
+    orphanage_id = accounts['orphanage']['id']
+    keys = [f"key-{i}" for i in range(20)]
+
+    async def donate(key):
+        response = await client.post("/api/donations/create", headers={**accounts['donor'], "Idempotency-Key": key},
+                                     json={"orphanage_id": orphanage_id, "amount": 100, "breakdown": {"MEALS": 100}})
+        assert response.status_code == 200, response.text
+        return response.json()['id']
+
+    ids = await asyncio.gather(*(donate(key) for key in keys * 10))
+
+    assert await mock_db.donations.count_documents({}) == len(keys)
+    assert len(set(ids)) == len(keys)
+    orphanage = await mock_db.orphanages.find_one({"id": orphanage_id})
+    assert orphanage['total_donations'] == 100 * len(keys)
+
+
+async def test_donation_to_missing_orphanage_leaves_nothing_behind(client, accounts, mock_db):
+    response = await client.post("/api/donations/create", headers=accounts['donor'],
+                                 json={"orphanage_id": "missing", "amount": 100, "breakdown": {"MEALS": 100}})
+    assert response.status_code == 404
+    assert await mock_db.donations.count_documents({}) == 0
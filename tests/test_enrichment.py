@@ -0,0 +1,70 @@
+import pytest
+
+import server
+from tests.conftest import create_orphanage, register
+
+pytestmark = pytest.mark.anyio
+
+QUERY_METHODS = {"find", "find_one", "aggregate", "count_documents", "distinct"}
+
+
+class CountingCollection:
+    def __init__(self, counter, collection):
+        self.counter = counter
+        self.collection = collection
+
+    def __getattr__(self, name):
+        if name in QUERY_METHODS:
+            self.counter.queries += 1
+        return getattr(self.collection, name)
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self.database = database
+        self.queries = 0
+
+    def __getattr__(self, name):
+        return CountingCollection(self, self.database[name])
+
+    def __getitem__(self, name):
+        return CountingCollection(self, self.database[name])
+
+
+async def add_donations(client, accounts, serials):
+    # Every donation touches a new orphanage and a new donor so enrichment has distinct ids to resolve
+    for i in serials:
+        orphanage = await create_orphanage(client, accounts['admin'], name=f"Home {i}", city="Nagpur")
+        donor = await register(client, f"donor{i}@example.org")
+        for headers, orphanage_id in ((accounts['donor'], orphanage['id']), (donor, accounts['orphanage']['id'])):
+            response = await client.post("/api/donations/create", headers=headers, json={
+                "orphanage_id": orphanage_id, "amount": 50, "breakdown": {"MEALS": 50}})
+            assert response.status_code == 200, response.text
+
+
+async def count_queries(client, monkeypatch, mock_db, path, headers):
+    # Warm the auth cache so only the listing itself is counted
+    assert (await client.get(path, headers=headers)).status_code == 200
+    counter = CountingDatabase(mock_db)
+    with monkeypatch.context() as patch:
+        patch.setattr(server, "db", counter)
+        patch.setattr(server, "read_db", counter)
+        response = await client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return counter.queries, len(response.json())
+
+
+@pytest.mark.parametrize("path, role", [
+    ("/api/donations/my", "donor"),
+    ("/api/orphanages/{orphanage_id}/donations", "orphanage_admin"),
+    ("/api/admin/donations", "admin"),
+])
+async def test_enriched_listing_query_count_is_constant(client, accounts, mock_db, monkeypatch, path, role):
+    path = path.format(orphanage_id=accounts['orphanage']['id'])
+    await add_donations(client, accounts, range(2))
+    few_queries, few = await count_queries(client, monkeypatch, mock_db, path, accounts[role])
+    await add_donations(client, accounts, range(2, 22))
+    many_queries, many = await count_queries(client, monkeypatch, mock_db, path, accounts[role])
+
+    assert many > few and few_queries > 0
+    assert many_queries == few_queries
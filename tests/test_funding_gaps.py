@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+from tests.conftest import create_orphanage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def funded_orphanage(client, accounts):
+    orphanage = await create_orphanage(client, accounts['orphanage_admin'], name="Prem Niwas", per_day_meal_cost=10)
+    response = await client.put(f"/api/admin/orphanages/{orphanage['id']}/verify", headers=accounts['admin'],
+                                params={"status": "VERIFIED"})
+    assert response.status_code == 200, response.text
+    return orphanage
+
+
+async def meal_need(mock_db, orphanage_id):
+    row = await mock_db.funding_gaps.find_one({"id": server.funding_gap_id(orphanage_id, "MEALS")})
+    return row and row['need']
+
+
+async def test_child_changes_refresh_funding_gaps(client, accounts, mock_db, funded_orphanage):
+    orphanage_id = funded_orphanage['id']
+    headers = accounts['orphanage_admin']
+    assert await meal_need(mock_db, orphanage_id) is None
+
+    child = (await client.post(f"/api/orphanages/{orphanage_id}/children", headers=headers,
+                               json={"name": "Ravi", "age": 9, "gender": "Male"})).json()
+    one_child = await meal_need(mock_db, orphanage_id)
+    assert one_child > 0
+
+    await client.post(f"/api/orphanages/{orphanage_id}/children/bulk", headers=headers,
+                      json=[{"name": "Meena", "age": 7, "gender": "Female"}])
+    assert await meal_need(mock_db, orphanage_id) == 2 * one_child
+
+    await client.delete(f"/api/orphanages/{orphanage_id}/children/{child['id']}", headers=headers)
+    assert await meal_need(mock_db, orphanage_id) == one_child
+
+
+async def test_refresh_keeps_rows_from_a_later_run(client, accounts, mock_db, funded_orphanage):
+    await client.post(f"/api/orphanages/{funded_orphanage['id']}/children", headers=accounts['orphanage_admin'],
+                      json={"name": "Ravi", "age": 9, "gender": "Male"})
+    # A run that started after ours already stamped this row
+    row_id = server.funding_gap_id(funded_orphanage['id'], "MEALS")
+    await mock_db.funding_gaps.update_one({"id": row_id}, {"$set": {"refreshed_at": "9999-01-01T00:00:00+00:00"}})
+    await mock_db.funding_gaps.insert_one({"id": "gone:MEALS", "orphanage_id": "gone", "refreshed_at": "2000-01-01"})
+
+    await server.refresh_funding_gaps()
+
+    assert await mock_db.funding_gaps.find_one({"id": row_id})
+    assert not await mock_db.funding_gaps.find_one({"id": "gone:MEALS"})
+
+
+async def test_refresh_reads_raised_from_donations_until_rollups_are_built(client, accounts, mock_db,
+                                                                           funded_orphanage):
+    orphanage_id = funded_orphanage['id']
+    await client.post(f"/api/orphanages/{orphanage_id}/children", headers=accounts['orphanage_admin'],
+                      json={"name": "Ravi", "age": 9, "gender": "Male"})
+    month = datetime.now(timezone.utc).strftime('%Y-%m')
+    for created_at, breakdown in ((f"{month}-01T10:00:00+00:00", {"MEALS": 40, "TOYS": 15}),
+                                  ("2000-01-01T10:00:00+00:00", {"MEALS": 500})):
+        donation = server.Donation(donor_id="donor", orphanage_id=orphanage_id, amount=sum(breakdown.values()),
+                                   breakdown=breakdown, gateway_reference="MOCK")
+        await mock_db.donations.insert_one({**server.to_document(donation), "created_at": created_at})
+    assert not await server.rollups_built()
+
+    await server.refresh_funding_gaps()
+
+    rows = {row['category']: row async for row in mock_db.funding_gaps.find({"orphanage_id": orphanage_id})}
+    assert rows['MEALS']['raised'] == 40
+    assert rows[server.FUNDING_GAP_TOTAL]['raised'] == 55
+
+
+async def test_lease_has_one_holder_until_it_expires(mock_db, monkeypatch):
+    await server.ensure_indexes()
+    monkeypatch.setattr(server, "WORKER_ID", "worker-a")
+    assert await server.acquire_lease("job", 60)
+    assert await server.acquire_lease("job", 60)
+
+    monkeypatch.setattr(server, "WORKER_ID", "worker-b")
+    assert not await server.acquire_lease("job", 60)
+
+    await mock_db.leases.update_one({"id": "job"}, {"$set": {"expires_at": "2000-01-01T00:00:00+00:00"}})
+    assert await server.acquire_lease("job", 60)
+    assert (await mock_db.leases.find_one({"id": "job"}))['holder'] == "worker-b"
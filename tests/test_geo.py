@@ -0,0 +1,77 @@
+import pytest
+
+import server
+from tests.conftest import create_orphanage
+
+pytestmark = pytest.mark.anyio
+
+PUNE = (18.5204, 73.8567)
+MUMBAI = (19.0760, 72.8777)
+
+
+@pytest.fixture
+def twin_cities(tmp_path, monkeypatch):
+    table = tmp_path / "city_centroids.csv"
+    table.write_text("city,state,latitude,longitude,aliases\n"
+                     "Aurangabad,Maharashtra,19.8762,75.3433,Chhatrapati Sambhajinagar\n"
+                     "Aurangabad,Bihar,24.7523,84.3744,\n")
+    monkeypatch.setattr(server, "CITY_CENTROIDS_PATH", table)
+    monkeypatch.setattr(server, "city_centroids", None)
+
+
+def test_geocode_city_matches_names_and_aliases():
+    assert server.geocode_city("Pune", "Maharashtra") == PUNE
+    assert server.geocode_city("  poona ", "maharashtra") == PUNE
+    assert server.geocode_city("Bombay", None) == MUMBAI
+    assert server.geocode_city("Atlantis", "Maharashtra") is None
+
+
+def test_ambiguous_city_needs_its_state(twin_cities):
+    assert server.geocode_city("Aurangabad", "Bihar") == (24.7523, 84.3744)
+    assert server.geocode_city("Chhatrapati Sambhajinagar", None) == (19.8762, 75.3433)
+    assert server.geocode_city("Aurangabad", None) is None
+    assert server.geocode_city("Aurangabad", "Maharastra") is None
+
+
+def test_location_fields_prefer_given_coordinates():
+    given = server.location_fields(18.6, 73.9, "Pune", "Maharashtra")
+    assert given['location_source'] == "provided"
+    assert given['location'] == {"type": "Point", "coordinates": [73.9, 18.6]}
+
+    centroid = server.location_fields(None, None, "Pune", "Maharashtra")
+    assert (centroid['latitude'], centroid['longitude'], centroid['location_source']) == (*PUNE, "city_centroid")
+    assert server.location_fields(18.6, None, "Atlantis", None) == {}
+
+
+async def test_city_move_follows_the_centroid_until_coordinates_are_pinned(client, accounts, mock_db):
+    orphanage_id = accounts['orphanage']['id']
+    headers = accounts['orphanage_admin']
+    assert (accounts['orphanage']['latitude'], accounts['orphanage']['location_source']) == (PUNE[0], "city_centroid")
+
+    response = await client.put(f"/api/orphanages/{orphanage_id}", headers=headers, json={"city": "Mumbai"})
+    assert response.status_code == 200, response.text
+    assert (response.json()['latitude'], response.json()['longitude']) == MUMBAI
+    assert (await mock_db.orphanages.find_one({"id": orphanage_id}))['location']['coordinates'] == [MUMBAI[1], MUMBAI[0]]
+
+    response = await client.put(f"/api/orphanages/{orphanage_id}", headers=headers, json={"city": "Atlantis"})
+    assert response.json()['latitude'] is None
+    assert 'location' not in await mock_db.orphanages.find_one({"id": orphanage_id})
+
+    await client.put(f"/api/orphanages/{orphanage_id}", headers=headers, json={"latitude": 19.1, "longitude": 72.9})
+    response = await client.put(f"/api/orphanages/{orphanage_id}", headers=headers, json={"city": "Pune"})
+    assert (response.json()['latitude'], response.json()['location_source']) == (19.1, "provided")
+
+    response = await client.put(f"/api/orphanages/{orphanage_id}", headers=headers, json={"latitude": 19.1})
+    assert response.status_code == 400
+
+
+async def test_created_orphanage_is_placed_at_its_city(client, accounts):
+    orphanage = await create_orphanage(client, accounts['admin'], name="Sneh Ghar", city="Bombay", state="")
+    assert (orphanage['latitude'], orphanage['longitude']) == MUMBAI
+
+
+@pytest.mark.parametrize("params", [{"near_lat": 18.5}, {"near_lng": 73.8}, {"radius_km": 5},
+                                    {"near_lat": 18.5, "radius_km": 5}])
+async def test_near_parameters_are_validated_together(client, params):
+    response = await client.get("/api/orphanages", params=params)
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stream_ticket_only_opens_streams(client, accounts):
+    response = await client.post("/api/events/ticket", headers=accounts['admin'])
+    assert response.status_code == 200, response.text
+    ticket = response.json()['ticket']
+
+    user = await server.get_stream_user(None, ticket)
+    assert user['role'] == "SUPER_ADMIN"
+    assert (await client.get("/api/auth/me", headers={"Authorization": f"Bearer {ticket}"})).status_code == 401
+
+
+async def test_stream_rejects_session_tokens_in_the_url(client, accounts):
+    token = accounts['admin']['Authorization'].split()[1]
+    assert (await client.get("/api/events/stream", params={"ticket": token})).status_code == 401
+    assert (await client.get("/api/events/stream", params={"token": token})).status_code == 403
+
+
+async def first_sse_frame(path: str, headers: dict) -> bytes:
+    # httpx's ASGI transport buffers the whole body, which never ends for a stream
+    received = asyncio.Queue()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+             "client": ("127.0.0.1", 1234), "server": ("test", 80)}
+
+    async def receive():
+        if not hasattr(receive, "sent"):
+            receive.sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        await received.put(message)
+
+    app = asyncio.ensure_future(server.app(scope, receive, send))
+    try:
+        start = await asyncio.wait_for(received.get(), 5)
+        assert start['status'] == 200, start
+        body = b""
+        while b"\n\n" not in body:
+            body += (await asyncio.wait_for(received.get(), 5)).get('body', b"")
+        return body
+    finally:
+        app.cancel()
+
+
+async def test_stream_opens_with_the_current_totals(client, accounts):
+    response = await client.post("/api/donations/create", headers=accounts['donor'], json={
+        "orphanage_id": accounts['orphanage']['id'], "amount": 120, "breakdown": {"MEALS": 120}})
+    assert response.status_code == 200, response.text
+
+    frame = await first_sse_frame("/api/events/stream", accounts['admin'])
+
+    assert frame.startswith(b"event: totals\n")
+    assert b'"total_amount":120' in frame.replace(b" ", b"")
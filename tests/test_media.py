@@ -0,0 +1,42 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def data_url():
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), (40, 120, 200)).save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+async def stored_photos(mock_db):
+    return {child['name']: child.get('photo') async for child in mock_db.children.find({})}
+
+
+async def test_bulk_and_csv_child_imports_move_photos_to_the_media_store(client, accounts, mock_db):
+    orphanage_id = accounts['orphanage']['id']
+    headers = accounts['orphanage_admin']
+    response = await client.post(f"/api/orphanages/{orphanage_id}/children/bulk", headers=headers, json=[
+        {"name": "Ravi", "age": 9, "gender": "Male", "photo": data_url()},
+        {"name": "Meena", "age": 7, "gender": "Female", "photo": "data:image/png;base64,not-base64!"},
+    ])
+    assert response.status_code == 200, response.text
+    assert response.json()['inserted'] == 1
+    assert response.json()['errors'][0]['row'] == 1
+
+    csv = f'name,age,gender,photo\nAnil,8,Male,"{data_url()}"\n'
+    response = await client.post(f"/api/orphanages/{orphanage_id}/children/import", headers=headers,
+                                 files={"file": ("children.csv", csv, "text/csv")})
+    assert response.json()['inserted'] == 1, response.text
+
+    photos = await stored_photos(mock_db)
+    assert set(photos) == {"Ravi", "Anil"}
+    for photo in photos.values():
+        assert photo.startswith(server.MEDIA_PUBLIC_URL + "/")
+        assert (await client.get(photo)).status_code == 200
@@ -0,0 +1,17 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_metrics_require_a_super_admin_or_the_scrape_token(client, accounts, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-secret")
+    assert (await client.get("/api/metrics")).status_code == 403
+    assert (await client.get("/api/metrics", headers=accounts['donor'])).status_code == 403
+    assert (await client.get("/api/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+
+    response = await client.get("/api/metrics", headers=accounts['admin'])
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+    assert (await client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})).status_code == 200
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def donations(accounts, mock_db):
+    # Pairs share a created_at so the id tie-break decides the order within them
+    ids = []
+    for i in range(5):
+        donation = server.Donation(donor_id="donor", orphanage_id=accounts['orphanage']['id'], amount=10 + i,
+                                   breakdown={"MEALS": 10 + i}, gateway_reference="MOCK")
+        await mock_db.donations.insert_one({**server.to_document(donation),
+                                            "created_at": f"2025-01-0{1 + i // 2}T10:00:00+00:00"})
+        ids.append((f"2025-01-0{1 + i // 2}", donation.id))
+    return [doc_id for _, doc_id in sorted(ids)]
+
+
+async def test_cursor_walks_every_page_once(client, accounts, donations):
+    seen, params = [], {"limit": 2}
+    while True:
+        response = await client.get("/api/admin/donations", headers=accounts['admin'], params=params)
+        assert response.status_code == 200, response.text
+        seen += [d['id'] for d in response.json()]
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['after'] = response.headers['X-Next-Cursor']
+    assert seen == donations
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", server.encode_cursor({"created_at": "2025", "id": "x"}, ("id",))])
+async def test_invalid_cursor_is_rejected(client, accounts, cursor):
+    response = await client.get("/api/admin/donations", headers=accounts['admin'], params={"after": cursor})
+    assert response.status_code == 400
+
+
+async def test_ndjson_export_streams_from_the_cursor(client, accounts, donations):
+    headers = accounts['admin']
+    response = await client.get("/api/admin/donations", headers=headers, params={"format": "ndjson"})
+    assert response.headers['content-type'] == "application/x-ndjson"
+    assert [json.loads(line)['id'] for line in response.text.splitlines()] == donations
+
+    first = await client.get("/api/admin/donations", headers=headers, params={"limit": 2})
+    response = await client.get("/api/admin/donations", headers=headers,
+                                params={"format": "ndjson", "after": first.headers['X-Next-Cursor']})
+    assert [json.loads(line)['id'] for line in response.text.splitlines()] == donations[2:]
+
+    response = await client.get("/api/admin/orphanages", headers=headers, params={"format": "ndjson", "view": "card"})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['id'] for row in rows] == [accounts['orphanage']['id']]
+    assert 'registration_number' not in rows[0]
@@ -0,0 +1,165 @@
+import io
+import os
+import uuid
+
+import httpx
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from PIL import Image
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+import server
+from tests.conftest import create_orphanage, register, use_database
+
+MONGO_TEST_URL = os.environ.get("MONGO_TEST_URL", os.environ["MONGO_URL"])
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Driver bookkeeping that explain rejects or that does not affect the plan
+SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit",
+                  "startTransaction", "readConcern", "writeConcern"}
+
+pytestmark = pytest.mark.anyio
+
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            self.commands.append(dict(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@pytest.fixture(scope="module")
+def mongo_url():
+    try:
+        MongoClient(MONGO_TEST_URL, serverSelectionTimeoutMS=500).admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"no mongod reachable at {MONGO_TEST_URL} (set MONGO_TEST_URL)")
+    return MONGO_TEST_URL
+
+
+@pytest.fixture
+async def live_db(mongo_url, monkeypatch):
+    recorder = CommandRecorder()
+    motor_client = AsyncIOMotorClient(mongo_url, event_listeners=[recorder])
+    name = f"orphancare_plans_{uuid.uuid4().hex[:8]}"
+    database = motor_client[name]
+    use_database(monkeypatch, database)
+    await server.ensure_indexes()
+    yield database, recorder
+    await motor_client.drop_database(name)
+    motor_client.close()
+
+
+def explain_targets(command):
+    body = {k: v for k, v in command.items() if k not in SESSION_FIELDS}
+    # Bulk writes carry many statements; explain takes one at a time
+    if "updates" in body:
+        return [{**body, "updates": [statement]} for statement in body["updates"]]
+    if "deletes" in body:
+        return [{**body, "deletes": [statement]} for statement in body["deletes"]]
+    return [body]
+
+
+def reads_whole_collection(command):
+    # An unfiltered, unsorted read scans everything by design (search index load, status counts)
+    if "find" in command:
+        return not command.get("filter") and not command.get("sort")
+    if "aggregate" in command:
+        pipeline = command.get("pipeline") or [{}]
+        return not {"$match", "$geoNear", "$sort"} & set(pipeline[0])
+    if "count" in command:
+        return not command.get("query")
+    statements = command.get("updates") or command.get("deletes") or []
+    return all(not statement.get("q") for statement in statements)
+
+
+def plan_stages(explain):
+    stages = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage":
+                stages.append(value)
+            stages += plan_stages(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            stages += plan_stages(item)
+    return stages
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (200, 120, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def exercise_routes(c: httpx.AsyncClient):
+    admin = await register(c, "admin@example.org", "SUPER_ADMIN")
+    donor = await register(c, "donor@example.org")
+    warden = await register(c, "warden@example.org", "ORPHANAGE_ADMIN")
+    await c.post("/api/auth/login", json={"email": "donor@example.org", "password": "secret"})
+    await c.get("/api/auth/me", headers=donor)
+
+    orphanage = await create_orphanage(c, warden)
+    orphanage_id = orphanage["id"]
+    await create_orphanage(c, admin, name="Sneh Ghar", city="Mumbai")
+    await c.put(f"/api/orphanages/{orphanage_id}", headers=warden, json={"mission": "Care"})
+    await c.put(f"/api/admin/orphanages/{orphanage_id}/verify", headers=admin, params={"status": "VERIFIED"})
+
+    child = (await c.post(f"/api/orphanages/{orphanage_id}/children", headers=warden,
+                          json={"name": "Ravi", "age": 9, "gender": "Male"})).json()
+    await c.post(f"/api/orphanages/{orphanage_id}/children/bulk", headers=warden,
+                 json=[{"name": "Meena", "age": 7, "gender": "Female"}])
+    await c.delete(f"/api/orphanages/{orphanage_id}/children/{child['id']}", headers=warden)
+    await c.post(f"/api/orphanages/{orphanage_id}/staff", headers=warden, json={"name": "Lata", "role": "Cook", "contact": "9000000002"})
+    await c.post(f"/api/orphanages/{orphanage_id}/staff/bulk", headers=warden, json=[{"name": "Anil", "role": "Teacher", "contact": "9000000003"}])
+
+    donation = (await c.post("/api/donations/create", headers={**donor, "Idempotency-Key": "plan-1"},
+                             json={"orphanage_id": orphanage_id, "amount": 500, "breakdown": {"MEALS": 500}})).json()
+    await c.post("/api/donations/create", headers={**donor, "Idempotency-Key": "plan-1"},
+                 json={"orphanage_id": orphanage_id, "amount": 500, "breakdown": {"MEALS": 500}})
+
+    media = (await c.post("/api/media", headers=warden, files={"file": ("logo.png", png_bytes(), "image/png")})).json()
+
+    for params in ({}, {"city": "Pune"}, {"state": "Maharashtra"}, {"type": "MIXED"}, {"verified": "true"},
+                   {"search": "asha"}, {"view": "card"}, {"near_lat": 18.5, "near_lng": 73.8, "radius_km": 50}):
+        await c.get("/api/orphanages", params=params)
+    await c.get(f"/api/orphanages/{orphanage['slug']}")
+    await c.get(f"/api/orphanages/{orphanage_id}/children")
+    await c.get(f"/api/orphanages/{orphanage_id}/staff")
+    await c.get(f"/api/orphanages/{orphanage_id}/donations", headers=warden)
+    await c.get("/api/donations/my", headers=donor)
+    await c.get(f"/api/donations/{donation['id']}/receipt", headers=donor)
+    await c.get(f"/api/media/{media['id']}")
+    await c.get("/api/funding-gaps", params={"city": "Pune"})
+    await c.get("/api/funding-gaps", params={"category": "MEALS"})
+    await c.get(f"/api/analytics/orphanage/{orphanage_id}", headers=warden)
+    await c.get("/api/analytics/platform", headers=admin)
+    await c.get("/api/admin/orphanages", headers=admin)
+    await c.get("/api/admin/donations", headers=admin)
+
+
+async def test_route_queries_use_indexes(live_db):
+    database, recorder = live_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as c:
+        await exercise_routes(c)
+
+    assert recorder.commands, "no queries were recorded"
+    scans = []
+    for command in recorder.commands:
+        if reads_whole_collection(command):
+            continue
+        for target in explain_targets(command):
+            explain = await database.command({"explain": target, "verbosity": "queryPlanner"})
+            if "COLLSCAN" in plan_stages(explain):
+                scans.append(target)
+    assert not scans, "collection scans:\n" + "\n".join(map(repr, scans))
@@ -0,0 +1,40 @@
+import uuid
+
+import mongomock_motor
+import pytest
+
+import server
+from tests.conftest import create_orphanage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def lagging_secondary(mock_db, monkeypatch):
+    # A secondary that never catches up: anything read from it misses the primary's writes
+    secondary = mongomock_motor.AsyncMongoMockClient()[f"secondary_{uuid.uuid4().hex[:8]}"]
+    monkeypatch.setattr(server, "read_db", server.ReadRouter(mock_db, secondary))
+    return secondary
+
+
+async def listed_names(client):
+    response = await client.get("/api/orphanages")
+    assert response.status_code == 200, response.text
+    return [o['name'] for o in response.json()]
+
+
+async def test_cache_fill_after_invalidation_reads_the_primary(client, accounts, lagging_secondary):
+    # Long after the fixture's writes, fills come from the (empty) secondary
+    server.response_cache.invalidated_at.clear()
+    assert await listed_names(client) == []
+
+    await create_orphanage(client, accounts['admin'], name="Sneh Ghar")
+
+    assert await listed_names(client) == ["Asha Home", "Sneh Ghar"]
+
+
+async def test_cache_fill_without_recent_writes_reads_the_secondary(client, accounts, lagging_secondary, monkeypatch):
+    monkeypatch.setattr(server, "MONGO_READ_MAX_STALENESS_SECONDS", 0)
+    await create_orphanage(client, accounts['admin'], name="Sneh Ghar")
+
+    assert await listed_names(client) == []
@@ -0,0 +1,71 @@
+import csv
+import io
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_donation(mock_db, donor_id, orphanage_id, created_at, breakdown):
+    donation = server.Donation(donor_id=donor_id, orphanage_id=orphanage_id, amount=sum(breakdown.values()),
+                               breakdown=breakdown, gateway_reference="MOCK")
+    await mock_db.donations.insert_one({**server.to_document(donation), "created_at": created_at})
+
+
+async def run_report(client, headers, **request):
+    response = await client.post("/api/admin/reports", headers=headers, json=request)
+    assert response.status_code == 200, response.text
+    job_id = response.json()['id']
+    await server.report_tasks[job_id]
+    return job_id
+
+
+async def download(client, headers, job_id):
+    response = await client.get(f"/api/admin/reports/{job_id}/download", headers=headers)
+    assert response.status_code == 200, response.text
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+@pytest.fixture
+async def history(accounts, mock_db):
+    donor = (await mock_db.users.find_one({"email": "donor@example.org"}))['id']
+    orphanage_id = accounts['orphanage']['id']
+    await add_donation(mock_db, donor, orphanage_id, "2025-03-01T10:00:00+00:00", {"MEALS": 100})
+    # A key from before the category list settled is reported as OTHER
+    await add_donation(mock_db, donor, orphanage_id, "2025-07-01T10:00:00+00:00", {"EDUCATION": 50, "BOOKS": 25})
+    await add_donation(mock_db, donor, orphanage_id, "2024-12-31T23:00:00+00:00", {"MEALS": 10})
+    return donor, orphanage_id
+
+
+async def test_donations_report_flattens_the_breakdown(client, accounts, history):
+    job_id = await run_report(client, accounts['admin'], kind="DONATIONS", year=2025)
+    rows = await download(client, accounts['admin'], job_id)
+
+    assert [float(row['amount']) for row in rows] == [100, 75]
+    assert (float(rows[1]['EDUCATION']), float(rows[1]['OTHER']), float(rows[1]['MEALS'])) == (50, 25, 0)
+    assert "BOOKS" not in rows[1]
+
+
+async def test_aggregate_reports_group_by_year(client, accounts, history):
+    donor, orphanage_id = history
+    job_id = await run_report(client, accounts['admin'], kind="DONOR_STATEMENTS")
+    statements = await download(client, accounts['admin'], job_id)
+    assert [(row['donor_id'], row['donor_name'], row['year'], int(row['donations']), float(row['total_amount']))
+            for row in statements] == [(donor, "donor", "2024", 1, 10), (donor, "donor", "2025", 2, 175)]
+
+    job_id = await run_report(client, accounts['admin'], kind="ORPHANAGE_CATEGORIES", year=2025)
+    [categories] = await download(client, accounts['admin'], job_id)
+    assert categories['orphanage_id'] == orphanage_id
+    assert categories['orphanage_name'] == accounts['orphanage']['name']
+    assert [float(categories[c]) for c in ("MEALS", "EDUCATION", "OTHER", "HEALTHCARE")] == [100, 50, 25, 0]
+
+
+async def test_download_of_a_report_built_elsewhere_is_gone(client, accounts, history):
+    job_id = await run_report(client, accounts['admin'], kind="DONATIONS")
+    job = await client.get(f"/api/admin/reports/{job_id}", headers=accounts['admin'])
+    server.report_path(job.json()).unlink()
+
+    response = await client.get(f"/api/admin/reports/{job_id}/download", headers=accounts['admin'])
+    assert response.status_code == 410
@@ -0,0 +1,49 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cached_routes_serialize_through_their_response_model(client, accounts, mock_db):
+    orphanage = accounts['orphanage']
+    headers = accounts['orphanage_admin']
+    await client.post(f"/api/orphanages/{orphanage['id']}/children", headers=headers,
+                      json={"name": "Ravi", "age": 9, "gender": "Male"})
+    await mock_db.orphanages.update_one({"id": orphanage['id']}, {"$set": {"internal_note": "not for donors"}})
+    await mock_db.children.update_many({}, {"$set": {"internal_note": "not for donors"}})
+
+    detail = await client.get(f"/api/orphanages/{orphanage['slug']}")
+    listing = await client.get("/api/orphanages")
+    children = await client.get(f"/api/orphanages/{orphanage['id']}/children")
+
+    assert detail.json()['name'] == orphanage['name']
+    assert [child['name'] for child in children.json()] == ["Ravi"]
+    for body in (detail.json(), *listing.json(), *children.json()):
+        assert "internal_note" not in body
+    # The card view only carries the fields it asked for, not every model default
+    card = (await client.get("/api/orphanages", params={"view": "card"})).json()[0]
+    assert "registration_number" not in card
+
+
+async def test_etag_revalidates_until_a_write_changes_the_body(client, accounts):
+    orphanage = accounts['orphanage']
+    headers = accounts['orphanage_admin']
+    detail = f"/api/orphanages/{orphanage['slug']}"
+    children = f"/api/orphanages/{orphanage['id']}/children"
+
+    first = await client.get(detail)
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == "no-cache"
+    unchanged = await client.get(detail, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert (unchanged.status_code, unchanged.content, unchanged.headers['ETag']) == (304, b"", etag)
+
+    await client.put(f"/api/orphanages/{orphanage['id']}", headers=headers, json={"mission": "Every child in school"})
+    changed = await client.get(detail, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()['mission'] == "Every child in school"
+    assert changed.headers['ETag'] != etag
+
+    etag = (await client.get(children)).headers['ETag']
+    await client.post(children, headers=headers, json={"name": "Ravi", "age": 9, "gender": "Male"})
+    response = await client.get(children, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [child['name'] for child in response.json()] == ["Ravi"]
@@ -0,0 +1,50 @@
+import pytest
+
+import server
+from tests.conftest import create_orphanage
+
+pytestmark = pytest.mark.anyio
+
+
+def home(doc_id, name, city="Pune", **fields):
+    return {"id": doc_id, "name": name, "city": city, "state": "Maharashtra", "type": "MIXED",
+            "verification_status": "PENDING", **fields}
+
+
+@pytest.mark.parametrize("query", ["asha", "ash", "ahsa", "asah", "asa", "ashaa"])
+def test_short_words_tolerate_one_typo(query):
+    index = server.OrphanageSearchIndex()
+    index.load([home("1", "Asha Home"), home("2", "Sneh Ghar")])
+    assert index.search(query) == ["1"]
+
+
+def test_filters_apply_before_the_result_cut():
+    index = server.OrphanageSearchIndex()
+    index.load([home(str(i), f"Sunrise Home {i}") for i in range(10)] + [home("m", "Sunrise Home", "Mumbai")])
+    assert "m" not in index.search("sunrise", limit=5)
+    assert index.search("sunrise", limit=5, filters={"city": "Mumbai"}) == ["m"]
+
+
+async def test_search_route_combines_text_and_filters(client, accounts):
+    await create_orphanage(client, accounts['admin'], name="Asha Kiran", city="Nagpur")
+    response = await client.get("/api/orphanages", params={"search": "ahsa", "city": "Nagpur"})
+    assert response.status_code == 200, response.text
+    assert [o['name'] for o in response.json()] == ["Asha Kiran"]
+
+    orphanage_id = accounts['orphanage']['id']
+    await client.put(f"/api/admin/orphanages/{orphanage_id}/verify", headers=accounts['admin'],
+                     params={"status": "VERIFIED"})
+    response = await client.get("/api/orphanages", params={"search": "asha", "verified": "true"})
+    assert [o['id'] for o in response.json()] == [orphanage_id]
+
+
+async def test_stale_index_keeps_serving_while_it_reloads(mock_db):
+    await mock_db.orphanages.insert_one(home("1", "Asha Home"))
+    assert (await server.get_search_index()).search("asha") == ["1"]
+
+    await mock_db.orphanages.insert_one(home("2", "Sneh Ghar"))
+    server.search_index.loaded_at -= server.SEARCH_INDEX_TTL_SECONDS + 1
+    assert (await server.get_search_index()).search("sneh") == []
+
+    await server.search_index_refresh
+    assert (await server.get_search_index()).search("sneh") == ["2"]